@@ -4,8 +4,11 @@ Lightweight HTTP server for move generation queries.
 Run with: python -m engine.api
 """
 import json
+import queue
 import sys
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from .types import MoveType
 from .board import Board
 from .movegen import generate_moves
 from .search import SearchEngine, CHECKMATE_SCORE, MAX_DEPTH
@@ -13,14 +16,84 @@ from .search import SearchEngine, CHECKMATE_SCORE, MAX_DEPTH
 
 PORT = 5005
 
+# Most search engines ever allocated (each TT is about 10 MB); further
+# /eval requests wait for one to be returned
+SEARCH_POOL_SIZE = 2
+
+# Seconds an idle kept-alive connection may hold its server thread
+IDLE_TIMEOUT = 30
+
+# One Board per connection thread, reused across its requests (set_fen
+# clears it); a board is small, unlike a search engine
+_local = threading.local()
+
+
+def _thread_board() -> Board:
+    board = getattr(_local, 'board', None)
+    if board is None:
+        board = _local.board = Board()
+    return board
+
+
+# Search engines shared by all connection threads. ThreadingHTTPServer starts
+# a thread per connection, so per-thread engines would be allocated per
+# connection; the pool allocates at most SEARCH_POOL_SIZE, lazily
+_searchers: queue.Queue = queue.Queue()
+_searchers_made = 0
+_searchers_lock = threading.Lock()
+
+
+def _checkout_searcher() -> SearchEngine:
+    """Take an engine from the pool (blocking when all are in use); hand it
+    back with _return_searcher(). Callers clear() it before searching."""
+    global _searchers_made
+    try:
+        return _searchers.get_nowait()
+    except queue.Empty:
+        pass
+    with _searchers_lock:
+        if _searchers_made < SEARCH_POOL_SIZE:
+            _searchers_made += 1
+            return SearchEngine()
+    return _searchers.get()
+
+
+def _return_searcher(searcher: SearchEngine):
+    _searchers.put(searcher)
+
+
+# '","type":"KLIK"}' etc. per move type, so moves are written straight to bytes
+_TYPE_JSON = {mt: f'","type":"{mt.name}"}}'.encode() for mt in MoveType}
+
+
+def _moves_payload(moves) -> bytes:
+    """JSON body for /moves, built directly as bytes (uci and type are plain ASCII)"""
+    buf = bytearray(b'{"count":')
+    buf += str(len(moves)).encode()
+    buf += b',"moves":['
+    for i, m in enumerate(moves):
+        if i:
+            buf += b','
+        buf += b'{"uci":"'
+        buf += m.to_uci().encode()
+        buf += _TYPE_JSON[m.move_type]
+    buf += b'],"error":null}'
+    return bytes(buf)
+
 
 class EngineHandler(BaseHTTPRequestHandler):
     """Handle HTTP requests for the Klikschaak engine."""
 
+    # Keep connections open between requests (every response sets Content-Length)
+    protocol_version = 'HTTP/1.1'
+    # Drop idle kept-alive connections instead of holding their thread forever
+    timeout = IDLE_TIMEOUT
+
     def do_OPTIONS(self):
         """Handle CORS preflight."""
         self.send_response(200)
         self._cors_headers()
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
     def do_GET(self):
@@ -32,17 +105,25 @@ class EngineHandler(BaseHTTPRequestHandler):
 
     def do_POST(self):
         """Handle move generation and evaluation requests."""
+        # Consume the body before anything can fail, so a kept-alive
+        # connection never sees leftover bytes as its next request line
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.close_connection = True
+            self._json_response({'error': 'Bad Content-Length'}, 400)
+            return
+        body = self.rfile.read(content_length) if content_length > 0 else b''
+
         if self.path == '/moves':
-            self._handle_moves()
+            self._handle_moves(body)
         elif self.path == '/eval':
-            self._handle_eval()
+            self._handle_eval(body)
         else:
             self._json_response({'error': 'Not found'}, 404)
 
-    def _handle_moves(self):
+    def _handle_moves(self, body: bytes):
         try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
             data = json.loads(body)
             fen = data.get('fen', '')
 
@@ -50,30 +131,17 @@ class EngineHandler(BaseHTTPRequestHandler):
                 self._json_response({'error': 'Missing fen field'}, 400)
                 return
 
-            board = Board()
+            board = _thread_board()
             board.set_fen(fen)
 
             moves = generate_moves(board, legal_only=True)
-            move_list = []
-            for m in moves:
-                move_list.append({
-                    'uci': m.to_uci(),
-                    'type': m.move_type.name,
-                })
-
-            self._json_response({
-                'count': len(moves),
-                'moves': move_list,
-                'error': None,
-            })
+            self._send_payload(_moves_payload(moves))
 
         except Exception as e:
             self._json_response({'error': str(e), 'count': 0, 'moves': []}, 500)
 
-    def _handle_eval(self):
+    def _handle_eval(self, body: bytes):
         try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
             data = json.loads(body)
             fen = data.get('fen', '')
             depth = data.get('depth', 4)
@@ -84,11 +152,15 @@ class EngineHandler(BaseHTTPRequestHandler):
 
             depth = max(1, min(depth, 10))
 
-            board = Board()
+            board = _thread_board()
             board.set_fen(fen)
 
-            searcher = SearchEngine()
-            best_move, info = searcher.search(board, depth)
+            searcher = _checkout_searcher()
+            try:
+                searcher.clear()
+                best_move, info = searcher.search(board, depth)
+            finally:
+                _return_searcher(searcher)
 
             score = info.score
             score_type = 'cp'
@@ -115,11 +187,16 @@ class EngineHandler(BaseHTTPRequestHandler):
             self._json_response({'error': str(e)}, 500)
 
     def _json_response(self, data, status=200):
+        self._send_payload(json.dumps(data).encode(), status)
+
+    def _send_payload(self, payload: bytes, status=200):
         self.send_response(status)
         self._cors_headers()
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Connection', 'keep-alive')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(payload)
 
     def _cors_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -133,7 +210,7 @@ class EngineHandler(BaseHTTPRequestHandler):
 
 
 def main():
-    server = HTTPServer(('localhost', PORT), EngineHandler)
+    server = ThreadingHTTPServer(('localhost', PORT), EngineHandler)
     print(f"Klikschaak Engine API running on http://localhost:{PORT}")
     print(f"  GET  /health  - Health check")
     print(f"  POST /moves   - Generate legal moves for a FEN position")
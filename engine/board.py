@@ -4,12 +4,22 @@ Klikschaak Engine - Board Representation
 from typing import List, Optional, Iterator, Tuple
 from .types import (
     Color, Piece, PieceType, Square, SquareStack, CastlingRights,
-    piece_color, piece_type, make_piece, make_square, square_file, square_rank,
-    square_name, PIECE_CHARS, CHAR_TO_PIECE
+    square_name, PIECE_CHARS_LIST, CHAR_TO_PIECE_ARR
 )
+from .zobrist import ZOBRIST_PIECE, ZOBRIST_TURN, ZOBRIST_CASTLING, ZOBRIST_EP
+from .pst import PIECE_SQUARE_SCORE
 
 STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
 
+_DIGITS = [str(n) for n in range(9)]
+
+# Castling right per FEN byte (0 = none)
+_CASTLING_BY_ASCII = [0] * 256
+_CASTLING_BY_ASCII[ord('K')] = CastlingRights.W_KINGSIDE
+_CASTLING_BY_ASCII[ord('Q')] = CastlingRights.W_QUEENSIDE
+_CASTLING_BY_ASCII[ord('k')] = CastlingRights.B_KINGSIDE
+_CASTLING_BY_ASCII[ord('q')] = CastlingRights.B_QUEENSIDE
+
 
 class Board:
     """
@@ -39,28 +49,70 @@ class Board:
         # King positions for quick lookup
         self.king_sq: List[int] = [Square.E1, Square.E8]
 
+        # Bitboards, kept in sync with squares by every mutator.
+        # bb[color][pt]: squares where that piece is the single or top piece
+        # bottom[color][pt]: squares where that piece is the bottom of a stack
+        # Every piece on the board owns exactly one bit in one of the two layers.
+        self.bb: List[List[int]] = [[0] * 7, [0] * 7]
+        self.bottom: List[List[int]] = [[0] * 7, [0] * 7]
+
+        # Occupancy per color (any stack level), all pieces, and 2-piece stacks
+        self.occ: List[int] = [0, 0]
+        self.occupied: int = 0
+        self.stack_bb: int = 0
+
+        # Number of each piece on the board, indexed by Piece value
+        self.piece_counts: List[int] = [0] * 15
+
+        # Running material + PST score (White-relative, king PST excluded),
+        # the sum of PIECE_SQUARE_SCORE over all pieces
+        self.psqt: int = 0
+
         # Unmoved pawns bitmask per color [WHITE, BLACK]
         # Bit X set = pawn on file X hasn't moved from starting rank
         self.unmoved_pawns: List[int] = [0xFF, 0xFF]
 
-        # Zobrist hash (updated incrementally by make/unmake)
+        # Zobrist hash, kept current by the piece mutators, set_fen and
+        # make/unmake (assigning turn/castling/ep by hand needs compute_zobrist)
         self.zobrist_hash: int = 0
 
         # Move history for undo
         self.history: List[dict] = []
 
+        # Last get_fen() result as (state key, fen), see get_fen
+        self._fen_cache: Optional[Tuple[tuple, str]] = None
+
     def copy(self) -> 'Board':
         """Create a deep copy of the board"""
-        b = Board()
-        b.squares = [sq.copy() for sq in self.squares]
+        # Skip __init__ (it would build 64 SquareStacks only to discard them)
+        # and give each bare SquareStack the same list: lists are replaced,
+        # never edited, so sharing them is safe
+        b = Board.__new__(Board)
+        new_stack = SquareStack.__new__
+        squares = []
+        append = squares.append
+        for stack in self.squares:
+            s = new_stack(SquareStack)
+            s.pieces = stack.pieces
+            append(s)
+        b.squares = squares
         b.turn = self.turn
         b.castling = self.castling
         b.ep_square = self.ep_square
         b.halfmove_clock = self.halfmove_clock
         b.fullmove = self.fullmove
         b.king_sq = self.king_sq.copy()
+        b.bb = [self.bb[0][:], self.bb[1][:]]
+        b.bottom = [self.bottom[0][:], self.bottom[1][:]]
+        b.occ = self.occ[:]
+        b.occupied = self.occupied
+        b.stack_bb = self.stack_bb
+        b.piece_counts = self.piece_counts[:]
+        b.psqt = self.psqt
         b.unmoved_pawns = self.unmoved_pawns.copy()
         b.zobrist_hash = self.zobrist_hash
+        b.history = []
+        b._fen_cache = self._fen_cache
         return b
 
     def reset(self):
@@ -76,9 +128,98 @@ class Board:
         self.halfmove_clock = 0
         self.fullmove = 1
         self.king_sq = [Square.NONE, Square.NONE]
+        self.bb = [[0] * 7, [0] * 7]
+        self.bottom = [[0] * 7, [0] * 7]
+        self.occ = [0, 0]
+        self.occupied = 0
+        self.stack_bb = 0
+        self.piece_counts = [0] * 15
+        self.psqt = 0
         self.unmoved_pawns = [0x00, 0x00]
-        self.zobrist_hash = 0
+        self.zobrist_hash = ZOBRIST_CASTLING[CastlingRights.NONE]
         self.history = []
+        self._fen_cache = None
+
+    # -------------------------------------------------------------------------
+    # Bitboard maintenance
+    # -------------------------------------------------------------------------
+
+    def _clear_bits(self, sq: int):
+        """Remove the pieces currently on sq from all bitboards, counts, psqt and the hash"""
+        pieces = self.squares[sq].pieces
+        if not pieces:
+            return
+        for i, p in enumerate(pieces):
+            self.zobrist_hash ^= ZOBRIST_PIECE[p][i][sq]
+            self.piece_counts[p] -= 1
+            self.psqt -= PIECE_SQUARE_SCORE[p][sq]
+        mask = ~(1 << sq)
+        if len(pieces) == 2:
+            p = pieces[0]
+            self.bottom[p >> 3][p & 7] &= mask
+        p = pieces[-1]
+        self.bb[p >> 3][p & 7] &= mask
+        self.occ[0] &= mask
+        self.occ[1] &= mask
+        self.occupied &= mask
+        self.stack_bb &= mask
+
+    def _set_bits(self, sq: int):
+        """Add the pieces currently on sq to all bitboards, counts, psqt and the hash"""
+        pieces = self.squares[sq].pieces
+        if not pieces:
+            return
+        for i, p in enumerate(pieces):
+            self.zobrist_hash ^= ZOBRIST_PIECE[p][i][sq]
+            self.piece_counts[p] += 1
+            self.psqt += PIECE_SQUARE_SCORE[p][sq]
+        bit = 1 << sq
+        if len(pieces) == 2:
+            p = pieces[0]
+            self.bottom[p >> 3][p & 7] |= bit
+            self.occ[p >> 3] |= bit
+            self.stack_bb |= bit
+        p = pieces[-1]
+        self.bb[p >> 3][p & 7] |= bit
+        self.occ[p >> 3] |= bit
+        self.occupied |= bit
+
+    def _rebuild_derived(self):
+        """Recompute bitboards, counts, psqt, king squares and the piece part
+        of the hash from the square lists in one pass"""
+        bb = [[0] * 7, [0] * 7]
+        bottom = [[0] * 7, [0] * 7]
+        occ = [0, 0]
+        stack_bb = 0
+        counts = [0] * 15
+        psqt = 0
+        h = 0
+        for sq, stack in enumerate(self.squares):
+            pieces = stack.pieces
+            if not pieces:
+                continue
+            bit = 1 << sq
+            for i, p in enumerate(pieces):
+                h ^= ZOBRIST_PIECE[p][i][sq]
+                counts[p] += 1
+                psqt += PIECE_SQUARE_SCORE[p][sq]
+                occ[p >> 3] |= bit
+                if p & 7 == PieceType.KING:
+                    self.king_sq[p >> 3] = sq
+            p = pieces[-1]
+            bb[p >> 3][p & 7] |= bit
+            if len(pieces) == 2:
+                p = pieces[0]
+                bottom[p >> 3][p & 7] |= bit
+                stack_bb |= bit
+        self.bb = bb
+        self.bottom = bottom
+        self.occ = occ
+        self.occupied = occ[0] | occ[1]
+        self.stack_bb = stack_bb
+        self.piece_counts = counts
+        self.psqt = psqt
+        self.zobrist_hash = h
 
     # -------------------------------------------------------------------------
     # Piece access
@@ -86,7 +227,7 @@ class Board:
 
     def piece_at(self, sq: int) -> Piece:
         """Get the top piece at a square"""
-        return self.squares[sq].top()
+        return Piece(self.squares[sq].top())
 
     def stack_at(self, sq: int) -> SquareStack:
         """Get the full stack at a square"""
@@ -98,27 +239,48 @@ class Board:
 
     def has_stack(self, sq: int) -> bool:
         """Check if square has a stack (2 pieces)"""
-        return self.squares[sq].has_stack()
+        return (self.stack_bb >> sq) & 1 == 1
 
     def put_piece(self, sq: int, piece: Piece):
         """Put a single piece on an empty square"""
-        self.squares[sq] = SquareStack([piece])
-        if piece_type(piece) == PieceType.KING:
-            self.king_sq[piece_color(piece)] = sq
+        self._clear_bits(sq)
+        self.squares[sq] = SquareStack([int(piece)])
+        self._set_bits(sq)
+        if piece & 7 == PieceType.KING:
+            self.king_sq[piece >> 3] = sq
+
+    def put_stack(self, sq: int, pieces: List[Piece]):
+        """Put a stack (bottom first) on a square, replacing its contents"""
+        self._clear_bits(sq)
+        self.squares[sq] = SquareStack([int(p) for p in pieces])
+        self._set_bits(sq)
+        for p in pieces:
+            if p & 7 == PieceType.KING:
+                self.king_sq[p >> 3] = sq
 
     def add_to_stack(self, sq: int, piece: Piece):
         """Add piece to stack (klik move)"""
+        self._clear_bits(sq)
         self.squares[sq].add(piece)
+        self._set_bits(sq)
 
     def remove_piece(self, sq: int) -> SquareStack:
         """Remove all pieces from square, return the stack"""
+        self._clear_bits(sq)
         stack = self.squares[sq].copy()
         self.squares[sq].clear()
         return stack
 
     def remove_from_stack(self, sq: int, index: int) -> Piece:
         """Remove specific piece from stack (unklik move)"""
-        return self.squares[sq].remove_at(index)
+        self._clear_bits(sq)
+        piece = self.squares[sq].remove_at(index)
+        self._set_bits(sq)
+        return Piece(piece)
+
+    def key(self) -> int:
+        """Zobrist hash of the current position"""
+        return self.zobrist_hash
 
     # -------------------------------------------------------------------------
     # Piece iteration
@@ -130,22 +292,45 @@ class Board:
         Yields (square, piece) tuples.
         For stacks, yields each piece separately with same square.
         """
-        for sq in range(64):
-            for piece in self.squares[sq].pieces:
-                if color is not None and piece_color(piece) != color:
-                    continue
-                if pt is not None and piece_type(piece) != pt:
+        if pt is not None:
+            # Straight from the layer bitboards: bottoms before tops keeps
+            # the bottom-first order within a stack
+            colors = (Color.WHITE, Color.BLACK) if color is None else (color,)
+            layers = [(self.bottom[c][pt], Piece(pt + 8 * c)) for c in colors]
+            layers += [(self.bb[c][pt], Piece(pt + 8 * c)) for c in colors]
+            bb = 0
+            for mask, _ in layers:
+                bb |= mask
+            while bb:
+                lsb = bb & -bb
+                sq = lsb.bit_length() - 1
+                bb ^= lsb
+                for mask, piece in layers:
+                    if mask & lsb:
+                        yield sq, piece
+            return
+
+        # Piece identity is cheapest to read from the square list itself
+        bb = self.occupied if color is None else self.occ[color]
+        squares = self.squares
+        while bb:
+            lsb = bb & -bb
+            sq = lsb.bit_length() - 1
+            bb ^= lsb
+            for piece in squares[sq].pieces:
+                # Inline piece_color (no NONE inside a stack)
+                if color is not None and piece >> 3 != color:
                     continue
-                yield sq, piece
+                yield sq, Piece(piece)
 
     def piece_squares(self, color: Color, pt: PieceType) -> List[int]:
         """Get list of squares with specific piece type"""
         result = []
-        for sq in range(64):
-            for piece in self.squares[sq].pieces:
-                if piece_color(piece) == color and piece_type(piece) == pt:
-                    result.append(sq)
-                    break  # Only count square once even if stacked
+        bb = self.bb[color][pt] | self.bottom[color][pt]
+        while bb:
+            lsb = bb & -bb
+            result.append(lsb.bit_length() - 1)
+            bb ^= lsb
         return result
 
     # -------------------------------------------------------------------------
@@ -160,61 +345,63 @@ class Board:
         if len(parts) < 4:
             raise ValueError(f"Invalid FEN: {fen}")
 
-        # Board
+        # Board: walk the placement field as bytes; pieces go straight into
+        # the square lists and the derived state is rebuilt once afterwards
+        squares = self.squares
         rank = 7
         file = 0
         i = 0
-        board_str = parts[0]
+        board_bytes = parts[0].encode()
+        n = len(board_bytes)
 
-        while i < len(board_str):
-            c = board_str[i]
+        while i < n:
+            c = board_bytes[i]
 
-            if c == '/':
+            if c == 0x2F:  # '/'
                 rank -= 1
                 file = 0
-            elif c.isdigit():
-                file += int(c)
-            elif c == '(':
+            elif 0x30 <= c <= 0x39:  # digit
+                file += c - 0x30
+            elif c == 0x28:  # '('
                 # Stack notation: (Np) = Knight on top of pawn
                 i += 1
                 pieces = []
-                while i < len(board_str) and board_str[i] != ')':
-                    if board_str[i] in CHAR_TO_PIECE:
-                        pieces.append(CHAR_TO_PIECE[board_str[i]])
+                while i < n and board_bytes[i] != 0x29:  # ')'
+                    p = CHAR_TO_PIECE_ARR[board_bytes[i]]
+                    if p is not None:
+                        pieces.append(p)
                     i += 1
-                sq = make_square(file, rank)
-                self.squares[sq] = SquareStack(pieces)
-                for p in pieces:
-                    if piece_type(p) == PieceType.KING:
-                        self.king_sq[piece_color(p)] = sq
-                file += 1
-            elif c in CHAR_TO_PIECE:
-                sq = make_square(file, rank)
-                piece = CHAR_TO_PIECE[c]
-                self.put_piece(sq, piece)
+                squares[rank * 8 + file] = SquareStack(pieces)
                 file += 1
+            else:
+                p = CHAR_TO_PIECE_ARR[c]
+                if p is not None:
+                    squares[rank * 8 + file] = SquareStack([p])
+                    file += 1
 
             i += 1
 
+        self._rebuild_derived()
+
         # Side to move
         self.turn = Color.WHITE if parts[1] == 'w' else Color.BLACK
 
         # Castling rights
-        self.castling = CastlingRights.NONE
-        if 'K' in parts[2]:
-            self.castling |= CastlingRights.W_KINGSIDE
-        if 'Q' in parts[2]:
-            self.castling |= CastlingRights.W_QUEENSIDE
-        if 'k' in parts[2]:
-            self.castling |= CastlingRights.B_KINGSIDE
-        if 'q' in parts[2]:
-            self.castling |= CastlingRights.B_QUEENSIDE
+        castling = 0
+        for c in parts[2].encode():
+            castling |= _CASTLING_BY_ASCII[c]
+        self.castling = castling
 
         # En passant
         if parts[3] != '-':
-            file = ord(parts[3][0]) - ord('a')
-            rank = int(parts[3][1]) - 1
-            self.ep_square = make_square(file, rank)
+            self.ep_square = (ord(parts[3][0]) - 97) | ((ord(parts[3][1]) - 49) << 3)
+
+        # Zobrist: pieces were hashed by _rebuild_derived, add the side state
+        self.zobrist_hash ^= ZOBRIST_CASTLING[self.castling]
+        if self.turn == Color.BLACK:
+            self.zobrist_hash ^= ZOBRIST_TURN
+        if self.ep_square is not None:
+            self.zobrist_hash ^= ZOBRIST_EP[self.ep_square & 7]
 
         # Halfmove clock and fullmove number
         if len(parts) > 4:
@@ -223,53 +410,63 @@ class Board:
             self.fullmove = int(parts[5])
 
         # Initialize unmoved_pawns based on pawns on starting ranks
-        self.unmoved_pawns = [0x00, 0x00]
-        for f in range(8):
-            # White pawns on rank 1 (index 1)
-            sq_w = make_square(f, 1)
-            for p in self.squares[sq_w].pieces:
-                if p == Piece.W_PAWN:
-                    self.unmoved_pawns[Color.WHITE] |= (1 << f)
-                    break
-            # Black pawns on rank 6 (index 6)
-            sq_b = make_square(f, 6)
-            for p in self.squares[sq_b].pieces:
-                if p == Piece.B_PAWN:
-                    self.unmoved_pawns[Color.BLACK] |= (1 << f)
-                    break
+        # (white rank 2, black rank 7), at either stack level
+        w_pawns = self.bb[Color.WHITE][PieceType.PAWN] | self.bottom[Color.WHITE][PieceType.PAWN]
+        b_pawns = self.bb[Color.BLACK][PieceType.PAWN] | self.bottom[Color.BLACK][PieceType.PAWN]
+        self.unmoved_pawns = [(w_pawns >> 8) & 0xFF, (b_pawns >> 48) & 0xFF]
 
     def get_fen(self) -> str:
-        """Get FEN string for current position"""
+        """
+        Get FEN string for current position.
+        The result is memoized against the Zobrist hash plus every FEN field
+        the hash does not cover, so it stays valid across make/unmake and
+        direct field assignments without explicit invalidation.
+        """
+        key = (self.zobrist_hash, self.turn, self.castling, self.ep_square,
+               self.halfmove_clock, self.fullmove)
+        cache = self._fen_cache
+        if cache is not None and cache[0] == key:
+            return cache[1]
+
+        fen = self._build_fen()
+        self._fen_cache = (key, fen)
+        return fen
+
+    def _build_fen(self) -> str:
+        """Build the FEN string from scratch"""
         fen_parts = []
 
-        # Board
-        board_str = ""
+        # Board: one rank at a time from the occupancy bitboard, pieces
+        # read straight from the square lists
+        squares = self.squares
+        occupied = self.occupied
+        stack_bb = self.stack_bb
+        out = []
+        append = out.append
         for rank in range(7, -1, -1):
-            empty = 0
-            for file in range(8):
-                sq = make_square(file, rank)
-                stack = self.squares[sq]
-
-                if stack.is_empty():
-                    empty += 1
-                else:
-                    if empty > 0:
-                        board_str += str(empty)
+            base = rank * 8
+            if not (occupied >> base) & 0xFF:
+                append('8')
+            else:
+                empty = 0
+                for sq in range(base, base + 8):
+                    if not (occupied >> sq) & 1:
+                        empty += 1
+                        continue
+                    if empty:
+                        append(_DIGITS[empty])
                         empty = 0
-
-                    if stack.has_stack():
+                    pieces = squares[sq].pieces
+                    if (stack_bb >> sq) & 1:
                         # Stack notation
-                        board_str += '('
-                        for p in stack.pieces:
-                            board_str += PIECE_CHARS[p]
-                        board_str += ')'
+                        append('(' + PIECE_CHARS_LIST[pieces[0]] + PIECE_CHARS_LIST[pieces[1]] + ')')
                     else:
-                        board_str += PIECE_CHARS[stack.top()]
-
-            if empty > 0:
-                board_str += str(empty)
+                        append(PIECE_CHARS_LIST[pieces[0]])
+                if empty:
+                    append(_DIGITS[empty])
             if rank > 0:
-                board_str += '/'
+                append('/')
+        board_str = ''.join(out)
 
         fen_parts.append(board_str)
 
@@ -307,21 +504,20 @@ class Board:
         lines.append("  +-----------------+")
 
         for rank in range(7, -1, -1):
-            line = f"{rank + 1} | "
-            for file in range(8):
-                sq = make_square(file, rank)
-                stack = self.squares[sq]
-
-                if stack.is_empty():
-                    line += ". "
-                elif stack.has_stack():
+            cells = [f"{rank + 1} | "]
+            for sq in range(rank * 8, rank * 8 + 8):
+                pieces = self.squares[sq].pieces
+
+                if not (self.occupied >> sq) & 1:
+                    cells.append(". ")
+                elif (self.stack_bb >> sq) & 1:
                     # Show stack as two chars
-                    line += PIECE_CHARS[stack.bottom()] + PIECE_CHARS[stack.top()].lower()
+                    cells.append(PIECE_CHARS_LIST[pieces[0]] + PIECE_CHARS_LIST[pieces[1]].lower())
                 else:
-                    line += PIECE_CHARS[stack.top()] + " "
+                    cells.append(PIECE_CHARS_LIST[pieces[0]] + " ")
 
-            line += "|"
-            lines.append(line)
+            cells.append("|")
+            lines.append(''.join(cells))
 
         lines.append("  +-----------------+")
         lines.append("    a b c d e f g h")
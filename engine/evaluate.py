@@ -1,475 +1,343 @@
 """
 Klikschaak Engine - Position Evaluation
 """
-from .types import (
-    Color, Piece, PieceType, Square, PIECE_VALUES,
-    piece_color, piece_type, square_rank, square_file
-)
+from .types import Color, Piece, PieceType, Square, PIECE_VALUES
 from .board import Board
-from .movegen import is_in_check, generate_moves
-
-# Piece-square tables (from White's perspective)
-# Values are centipawns (1/100 of a pawn)
-
-PAWN_TABLE = [
-      0,   0,   0,   0,   0,   0,   0,   0,
-     50,  50,  50,  50,  50,  50,  50,  50,
-     10,  10,  20,  30,  30,  20,  10,  10,
-      5,   5,  10,  25,  25,  10,   5,   5,
-      0,   0,   0,  20,  20,   0,   0,   0,
-      5,  -5, -10,   0,   0, -10,  -5,   5,
-      5,  10,  10, -20, -20,  10,  10,   5,
-      0,   0,   0,   0,   0,   0,   0,   0,
-]
-
-KNIGHT_TABLE = [
-    -50, -40, -30, -30, -30, -30, -40, -50,
-    -40, -20,   0,   0,   0,   0, -20, -40,
-    -30,   0,  10,  15,  15,  10,   0, -30,
-    -30,   5,  15,  20,  20,  15,   5, -30,
-    -30,   0,  15,  20,  20,  15,   0, -30,
-    -30,   5,  10,  15,  15,  10,   5, -30,
-    -40, -20,   0,   5,   5,   0, -20, -40,
-    -50, -40, -30, -30, -30, -30, -40, -50,
-]
-
-BISHOP_TABLE = [
-    -20, -10, -10, -10, -10, -10, -10, -20,
-    -10,   0,   0,   0,   0,   0,   0, -10,
-    -10,   0,   5,  10,  10,   5,   0, -10,
-    -10,   5,   5,  10,  10,   5,   5, -10,
-    -10,   0,  10,  10,  10,  10,   0, -10,
-    -10,  10,  10,  10,  10,  10,  10, -10,
-    -10,   5,   0,   0,   0,   0,   5, -10,
-    -20, -10, -10, -10, -10, -10, -10, -20,
-]
-
-ROOK_TABLE = [
-      0,   0,   0,   0,   0,   0,   0,   0,
-      5,  10,  10,  10,  10,  10,  10,   5,
-     -5,   0,   0,   0,   0,   0,   0,  -5,
-     -5,   0,   0,   0,   0,   0,   0,  -5,
-     -5,   0,   0,   0,   0,   0,   0,  -5,
-     -5,   0,   0,   0,   0,   0,   0,  -5,
-     -5,   0,   0,   0,   0,   0,   0,  -5,
-      0,   0,   0,   5,   5,   0,   0,   0,
-]
-
-QUEEN_TABLE = [
-    -20, -10, -10,  -5,  -5, -10, -10, -20,
-    -10,   0,   0,   0,   0,   0,   0, -10,
-    -10,   0,   5,   5,   5,   5,   0, -10,
-     -5,   0,   5,   5,   5,   5,   0,  -5,
-      0,   0,   5,   5,   5,   5,   0,  -5,
-    -10,   5,   5,   5,   5,   5,   0, -10,
-    -10,   0,   5,   0,   0,   0,   0, -10,
-    -20, -10, -10,  -5,  -5, -10, -10, -20,
-]
-
-KING_MIDDLEGAME_TABLE = [
-    -30, -40, -40, -50, -50, -40, -40, -30,
-    -30, -40, -40, -50, -50, -40, -40, -30,
-    -30, -40, -40, -50, -50, -40, -40, -30,
-    -30, -40, -40, -50, -50, -40, -40, -30,
-    -20, -30, -30, -40, -40, -30, -30, -20,
-    -10, -20, -20, -20, -20, -20, -20, -10,
-     20,  20,   0,   0,   0,   0,  20,  20,
-     20,  30,  10,   0,   0,  10,  30,  20,
-]
-
-KING_ENDGAME_TABLE = [
-    -50, -40, -30, -20, -20, -30, -40, -50,
-    -30, -20, -10,   0,   0, -10, -20, -30,
-    -30, -10,  20,  30,  30,  20, -10, -30,
-    -30, -10,  30,  40,  40,  30, -10, -30,
-    -30, -10,  30,  40,  40,  30, -10, -30,
-    -30, -10,  20,  30,  30,  20, -10, -30,
-    -30, -30,   0,   0,   0,   0, -30, -30,
-    -50, -30, -30, -30, -30, -30, -30, -50,
-]
-
-PST = {
-    PieceType.PAWN: PAWN_TABLE,
-    PieceType.KNIGHT: KNIGHT_TABLE,
-    PieceType.BISHOP: BISHOP_TABLE,
-    PieceType.ROOK: ROOK_TABLE,
-    PieceType.QUEEN: QUEEN_TABLE,
-    PieceType.KING: KING_MIDDLEGAME_TABLE,
-}
-
-
-def mirror_square(sq: int) -> int:
-    """Mirror square for black's perspective"""
-    return sq ^ 56  # Flip rank
-
-
-def evaluate(board: Board) -> int:
-    """
-    Evaluate position from White's perspective.
-    Returns score in centipawns.
-    Positive = good for White, Negative = good for Black.
-    Single-pass evaluation: material, PST, stacks, endgame detection all in one loop.
-    """
-    score = 0
-    squares = board.squares
+from .movegen import is_in_check, generate_moves, count_pseudo_moves
+from .pst import (
+    PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE,
+    KING_MIDDLEGAME_TABLE, KING_ENDGAME_TABLE, PST, MIRROR, mirror_square,
+    KING_MIDDLEGAME_TABLE_B, KING_ENDGAME_TABLE_B, PIECE_SQUARE_SCORE,
+    KING_ENDGAME_DELTA
+)
 
-    # First pass: detect endgame + material + PST + stacks + pawn file data
-    queens = 0
-    minors = 0
-    king_pst_w = 0
-    king_pst_b = 0
-    king_sq_w_local = 0
-    king_sq_b_local = 0
-
-    # Pawn file bitmasks for passed pawn eval
-    w_pawn_files = [0] * 8
-    b_pawn_files = [0] * 8
-    w_pawn_sqs = []
-    b_pawn_sqs = []
-
-    for sq in range(64):
-        pieces = squares[sq].pieces
-        npieces = len(pieces)
-        if npieces == 0:
-            continue
-
-        for piece in pieces:
-            pval = int(piece)
-            is_white = pval < 8
-            pt = pval & 7  # piece_type inline
-
-            # Material value
-            value = PIECE_VALUES[pt]
-            if is_white:
-                score += value
-            else:
-                score -= value
-
-            # PST (defer king to after endgame detection)
-            if pt == 6:  # KING
-                if is_white:
-                    king_sq_w_local = sq
-                else:
-                    king_sq_b_local = sq
-            elif pt <= 5 and pt >= 1:
-                table = PST[pt]
-                table_sq = sq if is_white else sq ^ 56
-                if is_white:
-                    score += table[table_sq]
-                else:
-                    score -= table[table_sq]
-
-            # Endgame detection counts
-            if pt == 5:  # QUEEN
-                queens += 1
-            elif pt in (2, 3, 4):  # KNIGHT, BISHOP, ROOK
-                minors += 1
-
-            # Pawn tracking for passed pawn eval
-            if pt == 1:  # PAWN
-                f = sq & 7
-                r = sq >> 3
-                if is_white:
-                    w_pawn_files[f] |= (1 << r)
-                    w_pawn_sqs.append(sq)
-                else:
-                    b_pawn_files[f] |= (1 << r)
-                    b_pawn_sqs.append(sq)
-
-        # Stack evaluation (inline)
-        if npieces == 2:
-            bottom = pieces[0]
-            top = pieces[1]
-            b_color = int(bottom) < 8
-            t_color = int(top) < 8
-            if b_color == t_color:
-                bottom_pt = int(bottom) & 7
-                top_pt = int(top) & 7
-                stack_value = 0
-                if bottom_pt in (2, 3) and top_pt in (2, 3):
-                    stack_value += 15
-                if bottom_pt in (2, 3) and top_pt == 4:
-                    stack_value += 20
-                if top_pt == 5 or bottom_pt == 5:
-                    stack_value += 5
-                if bottom_pt == 1:
-                    stack_value += 10
-                if top_pt != 1 and bottom_pt == 1:
-                    stack_value -= 5
-                if b_color:
-                    score += stack_value
-                else:
-                    score -= stack_value
-
-    # Endgame detection
-    endgame = queens == 0 or (queens == 1 and minors <= 1)
-    king_table = KING_ENDGAME_TABLE if endgame else KING_MIDDLEGAME_TABLE
-
-    # Add king PST
-    score += king_table[king_sq_w_local]
-    score -= king_table[king_sq_b_local ^ 56]
 
-    # King safety
-    score += evaluate_king_safety(board)
-
-    # Passed pawn evaluation (using pre-computed file data)
-    for sq in w_pawn_sqs:
-        file = sq & 7
-        rank = sq >> 3
-        ahead_mask = ~((1 << (rank + 1)) - 1) & 0xFF
-        is_passed = True
-        for f in range(max(0, file - 1), min(8, file + 2)):
-            if b_pawn_files[f] & ahead_mask:
-                is_passed = False
-                break
-        if is_passed:
-            advancement = rank - 1
-            bonus = PASSED_PAWN_BONUS[min(advancement, 6)] if advancement >= 0 else 0
-            if len(squares[sq].pieces) >= 2:
-                bonus += 15
-            score += bonus
-
-    for sq in b_pawn_sqs:
-        file = sq & 7
-        rank = sq >> 3
-        ahead_mask = (1 << rank) - 1
-        is_passed = True
-        for f in range(max(0, file - 1), min(8, file + 2)):
-            if w_pawn_files[f] & ahead_mask:
-                is_passed = False
-                break
-        if is_passed:
-            advancement = 6 - rank
-            bonus = PASSED_PAWN_BONUS[min(advancement, 6)] if advancement >= 0 else 0
-            if len(squares[sq].pieces) >= 2:
-                bonus += 15
-            score -= bonus
+def _stack_bonus(bottom_pt: int, top_pt: int) -> int:
+    """Bonus for a friendly stack, from the stack owner's perspective"""
+    stack_value = 0
 
-    # Check bonus
-    if is_in_check(board, Color.BLACK):
-        score += 50
-    if is_in_check(board, Color.WHITE):
-        score -= 50
+    # Minor piece on minor piece - slight bonus (protected)
+    if bottom_pt in (PieceType.KNIGHT, PieceType.BISHOP) and \
+       top_pt in (PieceType.KNIGHT, PieceType.BISHOP):
+        stack_value += 15
 
-    return score
+    # Rook on minor - good for attack
+    if bottom_pt in (PieceType.KNIGHT, PieceType.BISHOP) and top_pt == PieceType.ROOK:
+        stack_value += 20
 
+    # Queen in stack - risky but powerful
+    if top_pt == PieceType.QUEEN or bottom_pt == PieceType.QUEEN:
+        stack_value += 10  # Small bonus for combined power
+        stack_value -= 5   # But slight penalty for risk
 
-def evaluate_stacks(board: Board) -> int:
-    """
-    Evaluate stacked pieces.
-    Stacks can be good (protected piece, combined attack) or bad (vulnerable).
-    """
-    score = 0
+    # Pawn protecting piece
+    if bottom_pt == PieceType.PAWN:
+        stack_value += 10  # Pawn underneath is protective
 
-    for sq in range(64):
-        stack = board.stack_at(sq)
-        if not stack.has_stack():
-            continue
+    # Piece on pawn - less mobile
+    if top_pt != PieceType.PAWN and bottom_pt == PieceType.PAWN:
+        stack_value -= 5  # Slightly limits pawn push
 
-        bottom = stack.bottom()
-        top = stack.top()
-        color = piece_color(bottom)
+    return stack_value
 
-        # Both pieces should be same color in a stack
-        if piece_color(top) != color:
-            continue
 
-        bottom_pt = piece_type(bottom)
-        top_pt = piece_type(top)
+# STACK_BONUS[bottom_pt][top_pt], looked up instead of re-deriving per stack
+STACK_BONUS = tuple(tuple(_stack_bonus(_b, _t) for _t in range(7)) for _b in range(7))
 
-        # Stack value adjustments
-        stack_value = 0
+# Enum members read per evaluation, bound once (class attribute lookups are slow)
+_PAWN = int(PieceType.PAWN)
 
-        # Minor piece on minor piece - slight bonus (protected)
-        if bottom_pt in (PieceType.KNIGHT, PieceType.BISHOP) and \
-           top_pt in (PieceType.KNIGHT, PieceType.BISHOP):
-            stack_value += 15
 
-        # Rook on minor - good for attack
-        if bottom_pt in (PieceType.KNIGHT, PieceType.BISHOP) and top_pt == PieceType.ROOK:
-            stack_value += 20
+def _stack_score(bottom: int, top: int) -> int:
+    """White-relative stack bonus for raw piece codes (0 for mixed colors
+    and unused codes)"""
+    if (bottom ^ top) & 8 or (bottom & 7) == 7 or (top & 7) == 7:
+        return 0
+    bonus = STACK_BONUS[bottom & 7][top & 7]
+    return bonus if bottom < 8 else -bonus
 
-        # Queen in stack - risky but powerful
-        if top_pt == PieceType.QUEEN or bottom_pt == PieceType.QUEEN:
-            stack_value += 10  # Small bonus for combined power
-            stack_value -= 5   # But slight penalty for risk
 
-        # Pawn protecting piece
-        if bottom_pt == PieceType.PAWN:
-            stack_value += 10  # Pawn underneath is protective
+# STACK_SCORE[(bottom << 4) | top]: signed stack bonus keyed by raw piece codes
+STACK_SCORE = tuple(_stack_score(_i >> 4, _i & 15) for _i in range(256))
 
-        # Piece on pawn - less mobile
-        if top_pt != PieceType.PAWN and bottom_pt == PieceType.PAWN:
-            stack_value -= 5  # Slightly limits pawn push
 
-        if color == Color.WHITE:
-            score += stack_value
-        else:
-            score -= stack_value
+# Evaluation caches. Scores are a pure function of the position, so entries
+# never go stale; a cache is simply emptied once it reaches its size limit.
+EVAL_CACHE_SIZE = 1 << 18
+PAWN_CACHE_SIZE = 1 << 14
+_eval_cache: dict = {}   # zobrist key -> evaluate() score
+_pawn_cache: dict = {}   # pawn bitboards -> evaluate_passed_pawns() score
+
+
+def clear_eval_cache():
+    """Empty the evaluation and pawn structure caches"""
+    _eval_cache.clear()
+    _pawn_cache.clear()
+
+
+def evaluate(board: Board, stm_in_check: bool = None, opp_in_check: bool = None) -> int:
+    """
+    Evaluate position from White's perspective.
+    Returns score in centipawns.
+    Positive = good for White, Negative = good for Black.
+    Results are cached by the board's Zobrist key, so transpositions are only
+    evaluated once.
+    stm_in_check / opp_in_check: whether the side to move / the other side is
+    in check, if the caller already knows (skips that check detection).
+    """
+    key = board.zobrist_hash
+    score = _eval_cache.get(key)
+    if score is None:
+        score = _evaluate(board, stm_in_check, opp_in_check)
+        if len(_eval_cache) >= EVAL_CACHE_SIZE:
+            _eval_cache.clear()
+        _eval_cache[key] = score
+    return score
+
+
+def _evaluate(board: Board, stm_in_check: bool = None, opp_in_check: bool = None) -> int:
+    """
+    evaluate() without the cache.
+    Material and PST (middlegame king table included) come from the board's
+    running psqt score, stacks walk board.stack_bb and endgame detection
+    reads board.piece_counts.
+    """
+    squares = board.squares
+    stack_bb = board.stack_bb
+
+    # Material + PST is kept up to date by the board
+    score = board.psqt
+
+    bb_w, bb_b = board.bb
+    bot_w, bot_b = board.bottom
+
+    # Stack evaluation: stacks can be good (protected piece, combined attack)
+    # or bad (vulnerable)
+    stack_score = STACK_SCORE
+    bb = stack_bb
+    while bb:
+        lsb = bb & -bb
+        bb ^= lsb
+        bottom, top = squares[lsb.bit_length() - 1].pieces
+        score += stack_score[(bottom << 4) | top]
+
+    # Endgame detection (same rule as is_endgame, from the maintained counts).
+    # psqt scored the kings with the middlegame table; switch them over.
+    counts = board.piece_counts
+    queens = counts[_W_QUEEN] + counts[_B_QUEEN]
+    if queens == 0 or (queens == 1 and _minor_count(counts) <= 1):
+        for kbb, delta in ((bb_w[6] | bot_w[6], KING_ENDGAME_DELTA[0]),
+                           (bb_b[6] | bot_b[6], KING_ENDGAME_DELTA[1])):
+            while kbb:
+                lsb = kbb & -kbb
+                score += delta[lsb.bit_length() - 1]
+                kbb ^= lsb
+
+    # Pawns at either stack level, shared by king safety and the pawn cache
+    w_pawns = bb_w[1] | bot_w[1]
+    b_pawns = bb_b[1] | bot_b[1]
+
+    # King safety
+    score += evaluate_king_safety(board, (w_pawns, b_pawns))
+
+    # Passed pawns only depend on the pawns and which of them are stacked
+    pawn_key = (bb_w[1], bot_w[1], bb_b[1], bot_b[1], stack_bb & (w_pawns | b_pawns))
+    passed = _pawn_cache.get(pawn_key)
+    if passed is None:
+        passed = evaluate_passed_pawns(board)
+        if len(_pawn_cache) >= PAWN_CACHE_SIZE:
+            _pawn_cache.clear()
+        _pawn_cache[pawn_key] = passed
+    score += passed
+
+    # Check bonus
+    stm = board.turn
+    if stm_in_check is None:
+        stm_in_check = is_in_check(board, stm)
+    if opp_in_check is None:
+        opp_in_check = is_in_check(board, stm ^ 1)
+    if stm == 0:
+        score += 50 * (opp_in_check - stm_in_check)
+    else:
+        score += 50 * (stm_in_check - opp_in_check)
 
     return score
 
 
 # Passed pawn bonus by rank advancement (from own side)
 # Index = ranks advanced (0 = starting rank, 6 = one before promotion)
-PASSED_PAWN_BONUS = [0, 10, 15, 25, 45, 75, 120]
+PASSED_PAWN_BONUS = (0, 10, 15, 25, 45, 75, 120)
+
+# Passed pawn bonus for a pawn of each color, by square (looked up by square
+# so the hot loop needs no rank arithmetic)
+W_PASSED_BONUS = tuple(PASSED_PAWN_BONUS[min((sq >> 3) - 1, 6)] if sq >= 8 else 0
+                       for sq in range(64))
+B_PASSED_BONUS = tuple(PASSED_PAWN_BONUS[min(6 - (sq >> 3), 6)] if sq < 56 else 0
+                       for sq in range(64))
+
+
+def _passed_mask(color: int, sq: int) -> int:
+    """Squares on the same and adjacent files ahead of a pawn on sq"""
+    file, rank = sq & 7, sq >> 3
+    ranks = range(rank + 1, 8) if color == 0 else range(rank)
+    mask = 0
+    for r in ranks:
+        for f in (file - 1, file, file + 1):
+            if 0 <= f < 8:
+                mask |= 1 << (r * 8 + f)
+    return mask
+
+
+# PASSED_MASK[color][sq]: a pawn there is passed if no enemy pawn is in it
+PASSED_MASK = tuple(tuple(_passed_mask(c, sq) for sq in range(64)) for c in (0, 1))
 
 
 def evaluate_passed_pawns(board: Board) -> int:
     """
     Evaluate passed pawns (no enemy pawns blocking or on adjacent files ahead).
-    Uses bitmask per file for fast lookup.
+    One bitboard test per pawn against PASSED_MASK.
     """
     score = 0
-    squares = board.squares
-
-    # Build per-file pawn rank sets: white_pawns[file] = set of ranks,
-    # black_pawns[file] = set of ranks
-    # Use bitmask: bit i set = pawn on rank i
-    w_pawn_files = [0] * 8
-    b_pawn_files = [0] * 8
-    w_pawn_sqs = []
-    b_pawn_sqs = []
-
-    for sq in range(64):
-        for piece in squares[sq].pieces:
-            if piece == Piece.W_PAWN:
-                f = sq & 7
-                r = sq >> 3
-                w_pawn_files[f] |= (1 << r)
-                w_pawn_sqs.append(sq)
-            elif piece == Piece.B_PAWN:
-                f = sq & 7
-                r = sq >> 3
-                b_pawn_files[f] |= (1 << r)
-                b_pawn_sqs.append(sq)
+    stack_bb = board.stack_bb
+    w_top = board.bb[0][_PAWN]
+    w_bottom = board.bottom[0][_PAWN]
+    b_top = board.bb[1][_PAWN]
+    b_bottom = board.bottom[1][_PAWN]
+    w_pawns = w_top | w_bottom
+    b_pawns = b_top | b_bottom
 
     # Check white pawns for being passed
-    for sq in w_pawn_sqs:
-        file = sq & 7
-        rank = sq >> 3
-        # Mask of ranks ahead: bits rank+1 through 7
-        ahead_mask = ~((1 << (rank + 1)) - 1) & 0xFF
-        is_passed = True
-        for f in range(max(0, file - 1), min(8, file + 2)):
-            if b_pawn_files[f] & ahead_mask:
-                is_passed = False
-                break
-        if is_passed:
-            advancement = rank - 1
-            bonus = PASSED_PAWN_BONUS[min(advancement, 6)] if advancement >= 0 else 0
-            if len(squares[sq].pieces) >= 2:
-                bonus += 15
-            score += bonus
+    w_mask = PASSED_MASK[0]
+    for bb in (w_top, w_bottom):
+        while bb:
+            lsb = bb & -bb
+            sq = lsb.bit_length() - 1
+            bb ^= lsb
+            if not b_pawns & w_mask[sq]:
+                score += W_PASSED_BONUS[sq]
+                if stack_bb & lsb:
+                    score += 15
 
     # Check black pawns for being passed
-    for sq in b_pawn_sqs:
-        file = sq & 7
-        rank = sq >> 3
-        # Mask of ranks ahead (for black, lower ranks): bits 0 through rank-1
-        ahead_mask = (1 << rank) - 1
-        is_passed = True
-        for f in range(max(0, file - 1), min(8, file + 2)):
-            if w_pawn_files[f] & ahead_mask:
-                is_passed = False
-                break
-        if is_passed:
-            advancement = 6 - rank
-            bonus = PASSED_PAWN_BONUS[min(advancement, 6)] if advancement >= 0 else 0
-            if len(squares[sq].pieces) >= 2:
-                bonus += 15
-            score -= bonus
+    b_mask = PASSED_MASK[1]
+    for bb in (b_top, b_bottom):
+        while bb:
+            lsb = bb & -bb
+            sq = lsb.bit_length() - 1
+            bb ^= lsb
+            if not w_pawns & b_mask[sq]:
+                score -= B_PASSED_BONUS[sq]
+                if stack_bb & lsb:
+                    score -= 15
 
     return score
 
 
-def evaluate_king_safety(board: Board) -> int:
-    """Evaluate king safety"""
-    score = 0
+def _shield_mask(color: int, king_sq: int) -> int:
+    """Squares directly in front of the king (same and adjacent files)"""
+    shield_rank = (king_sq >> 3) + (1 if color == 0 else -1)
+    mask = 0
+    if 0 <= shield_rank < 8:
+        for df in (-1, 0, 1):
+            f = (king_sq & 7) + df
+            if 0 <= f < 8:
+                mask |= 1 << (shield_rank * 8 + f)
+    return mask
+
+
+# KING_SHIELD_MASK[color][king_sq]: pawn shield squares for a king there
+KING_SHIELD_MASK = tuple(tuple(_shield_mask(c, sq) for sq in range(64)) for c in (0, 1))
+
+CASTLED_SQUARES = (frozenset({int(Square.G1), int(Square.C1)}),
+                   frozenset({int(Square.G8), int(Square.C8)}))
+HOME_SQUARES = (int(Square.E1), int(Square.E8))
 
-    for color in [Color.WHITE, Color.BLACK]:
-        king_sq = board.king_sq[color]
-        if king_sq < 0 or king_sq >= 64:
-            continue
-
-        king_file = square_file(king_sq)
-        king_rank = square_rank(king_sq)
-        safety = 0
-
-        # Castled king bonus
-        if color == Color.WHITE:
-            if king_sq in (Square.G1, Square.C1):
-                safety += 30
-            elif king_sq == Square.E1:
-                safety -= 20  # Uncastled penalty
-        else:
-            if king_sq in (Square.G8, Square.C8):
-                safety += 30
-            elif king_sq == Square.E8:
-                safety -= 20
-
-        # Pawn shield
-        pawn = Piece.W_PAWN if color == Color.WHITE else Piece.B_PAWN
-        shield_rank = king_rank + (1 if color == Color.WHITE else -1)
-
-        if 0 <= shield_rank < 8:
-            for df in [-1, 0, 1]:
-                f = king_file + df
-                if 0 <= f < 8:
-                    sq = shield_rank * 8 + f
-                    if pawn in board.stack_at(sq).pieces:
-                        safety += 10
 
+def _king_square_safety(color: int, king_sq: int) -> int:
+    """Castled king bonus / uncastled penalty for a king on king_sq"""
+    if king_sq in CASTLED_SQUARES[color]:
+        return 30
+    if king_sq == HOME_SQUARES[color]:
+        return -20
+    return 0
+
+
+# KING_SQUARE_SAFETY[color][king_sq]: the king-square part of king safety
+KING_SQUARE_SAFETY = tuple(tuple(_king_square_safety(c, sq) for sq in range(64))
+                           for c in (0, 1))
+
+
+def evaluate_king_safety(board: Board, pawns: tuple = None) -> int:
+    """
+    Evaluate king safety.
+    pawns: (white, black) pawn bitboards over both stack levels, if the
+    caller already has them.
+    """
+    score = 0
+
+    stack_bb = board.stack_bb
+    king_sqs = board.king_sq
+    if pawns is None:
+        bb, bottom = board.bb, board.bottom
+        pawns = (bb[0][_PAWN] | bottom[0][_PAWN], bb[1][_PAWN] | bottom[1][_PAWN])
+
+    # Unrolled per color, with the per-square terms read from KING_SQUARE_SAFETY
+    king_sq = king_sqs[0]
+    if 0 <= king_sq < 64:
+        score += (KING_SQUARE_SAFETY[0][king_sq] +
+                  10 * (pawns[0] & KING_SHIELD_MASK[0][king_sq]).bit_count())
         # King in stack is bad (can't escape easily)
-        if board.stack_at(king_sq).has_stack():
-            safety -= 40
+        if (stack_bb >> king_sq) & 1:
+            score -= 40
 
-        if color == Color.WHITE:
-            score += safety
-        else:
-            score -= safety
+    king_sq = king_sqs[1]
+    if 0 <= king_sq < 64:
+        score -= (KING_SQUARE_SAFETY[1][king_sq] +
+                  10 * (pawns[1] & KING_SHIELD_MASK[1][king_sq]).bit_count())
+        if (stack_bb >> king_sq) & 1:
+            score += 40
 
     return score
 
 
-def evaluate_mobility(board: Board) -> int:
+def evaluate_mobility(board: Board, moves=None) -> int:
     """
-    Evaluate mobility (number of legal moves).
+    Evaluate mobility (number of pseudo-legal moves).
     This is expensive, use sparingly.
+    moves: pseudo-legal moves already generated for the side to move, if the
+    caller has them (then only the other side's moves are generated).
+    Otherwise both sides are counted in a single walk over the board.
     """
-    # Save turn
-    original_turn = board.turn
+    if moves is None:
+        white_moves, black_moves = count_pseudo_moves(board)
+    else:
+        own = len(moves)
+        other = len(generate_moves(board, legal_only=False, side=board.turn.opposite()))
+        white_moves, black_moves = (own, other) if board.turn == Color.WHITE else (other, own)
 
-    # Count white moves
-    board.turn = Color.WHITE
-    white_moves = len(generate_moves(board, legal_only=False))
+    # Each move is worth about 5 centipawns
+    return (white_moves - black_moves) * 5
 
-    # Count black moves
-    board.turn = Color.BLACK
-    black_moves = len(generate_moves(board, legal_only=False))
 
-    # Restore turn
-    board.turn = original_turn
+# Piece count indices, as plain ints: knight, bishop and rook codes are
+# consecutive for each color
+_W_QUEEN, _B_QUEEN = int(Piece.W_QUEEN), int(Piece.B_QUEEN)
+_W_MINORS = slice(int(Piece.W_KNIGHT), int(Piece.W_ROOK) + 1)
+_B_MINORS = slice(int(Piece.B_KNIGHT), int(Piece.B_ROOK) + 1)
 
-    # Each move is worth about 5 centipawns
-    return (white_moves - black_moves) * 5
+
+def _minor_count(counts) -> int:
+    """Knights, bishops and rooks of both colors"""
+    return sum(counts[_W_MINORS]) + sum(counts[_B_MINORS])
 
 
 def is_endgame(board: Board) -> bool:
     """Check if we're in endgame (for king table selection)"""
-    queens = 0
-    minors = 0
-
-    for sq in range(64):
-        for piece in board.stack_at(sq).pieces:
-            pt = piece_type(piece)
-            if pt == PieceType.QUEEN:
-                queens += 1
-            elif pt in (PieceType.KNIGHT, PieceType.BISHOP, PieceType.ROOK):
-                minors += 1
+    counts = board.piece_counts
+    queens = counts[_W_QUEEN] + counts[_B_QUEEN]
 
     # Endgame if no queens or only one side has queen with minimal material
-    return queens == 0 or (queens == 1 and minors <= 1)
+    return queens == 0 or (queens == 1 and _minor_count(counts) <= 1)
 
 
 # Constants for search
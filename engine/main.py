@@ -1,7 +1,7 @@
 """
 Klikschaak Engine - Test & Demo Script
 """
-from .types import Color, PieceType, square_name, parse_square
+from .types import Color, Piece, PieceType, piece_type, square_name, parse_square
 from .board import Board, STARTING_FEN
 from .movegen import generate_moves, make_move, is_in_check, is_legal
 from .evaluate import evaluate
@@ -90,7 +90,6 @@ def test_klik_moves():
     moves = generate_moves(board)
 
     # Find knight moves
-    from .types import piece_type, Piece
     knight_moves = [m for m in moves if piece_type(board.piece_at(m.from_sq)) == PieceType.KNIGHT]
     print(f"\nKnight moves available: {len(knight_moves)}")
     for m in knight_moves:
@@ -199,7 +198,7 @@ def test_stack_fen():
     stack = board.stack_at(sq)
     print(f"\nStack at e4: {len(stack.pieces)} pieces")
     for i, p in enumerate(stack.pieces):
-        print(f"  [{i}]: {p.name}")
+        print(f"  [{i}]: {Piece(p).name}")
 
     # Get FEN back
     fen = board.get_fen()
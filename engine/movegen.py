@@ -3,20 +3,31 @@ Klikschaak Engine - Move Generation
 """
 from typing import List, Optional
 from .types import (
-    Color, Piece, PieceType, Square, Move, MoveType, CastlingRights,
+    Color, Piece, PieceType, Square, Move, MoveType, CastlingRights, OPPOSITE_COLOR,
     piece_color, piece_type, make_piece, make_square, square_file, square_rank
 )
 from .board import Board
+from .zobrist import ZOBRIST_PIECE, ZOBRIST_TURN, ZOBRIST_CASTLING, ZOBRIST_EP
+from .pst import PIECE_SQUARE_SCORE
+
+
+# Enum members used in hot loops, bound once: a global lookup is far cheaper
+# than an enum class attribute. Piece types are bare ints (bitboard indices);
+# move types and promotions stay enum members, since Move carries them.
+_PAWN, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING = (
+    int(PieceType.PAWN), int(PieceType.KNIGHT), int(PieceType.BISHOP),
+    int(PieceType.ROOK), int(PieceType.QUEEN), int(PieceType.KING))
+_NORMAL = MoveType.NORMAL
+_CAPTURE = MoveType.CAPTURE
+_KLIK = MoveType.KLIK
+_UNKLIK_KLIK = MoveType.UNKLIK_KLIK
+_EN_PASSANT = MoveType.EN_PASSANT
+_PROMOTION = MoveType.PROMOTION
+_PROMOTION_CAPTURE = MoveType.PROMOTION_CAPTURE
+_PROMOTION_PIECES = (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT)
+_WHITE = Color.WHITE
+_NO_SQUARE = int(Square.NONE)
 
-# Cached reference to ZOBRIST keys (populated lazily to avoid circular import)
-_ZOBRIST = None
-
-def _get_zobrist():
-    global _ZOBRIST
-    if _ZOBRIST is None:
-        from .search import ZOBRIST
-        _ZOBRIST = ZOBRIST
-    return _ZOBRIST
 
 # Direction offsets for pieces
 KNIGHT_OFFSETS = [-17, -15, -10, -6, 6, 10, 15, 17]
@@ -50,16 +61,164 @@ def _init_move_tables():
                     KING_TABLE[sq].append(to)
 
 _init_move_tables()
+# Frozen to tuples: cheaper to iterate than lists and never mutated
+KNIGHT_TABLE = tuple(tuple(targets) for targets in KNIGHT_TABLE)
+KING_TABLE = tuple(tuple(targets) for targets in KING_TABLE)
+
+# The same targets as bitboards, for attack tests against piece bitboards
+KNIGHT_MASK = tuple(sum(1 << t for t in KNIGHT_TABLE[sq]) for sq in range(64))
+KING_MASK = tuple(sum(1 << t for t in KING_TABLE[sq]) for sq in range(64))
+
+
+def _pawn_attacker_mask(color: int, sq: int) -> int:
+    """Squares from which a pawn of `color` attacks sq"""
+    rank = (sq >> 3) - (1 if color == Color.WHITE else -1)
+    if not 0 <= rank < 8:
+        return 0
+    mask = 0
+    for f in ((sq & 7) - 1, (sq & 7) + 1):
+        if 0 <= f < 8:
+            mask |= 1 << (rank * 8 + f)
+    return mask
+
+
+# PAWN_ATTACKER_MASK[color][sq]: where color's pawns must stand to hit sq
+PAWN_ATTACKER_MASK = tuple(tuple(_pawn_attacker_mask(c, sq) for sq in range(64))
+                           for c in (Color.WHITE, Color.BLACK))
+
+
+def _pawn_captures(color: int, sq: int) -> tuple:
+    """Diagonal capture squares of a pawn of `color` on sq"""
+    rank = (sq >> 3) + (1 if color == Color.WHITE else -1)
+    if not 0 <= rank < 8:
+        return ()
+    return tuple(rank * 8 + f for f in ((sq & 7) - 1, (sq & 7) + 1) if 0 <= f < 8)
+
+
+# PAWN_CAPTURE_TABLE[color][sq]: capture targets, edge files already dropped
+PAWN_CAPTURE_TABLE = tuple(tuple(_pawn_captures(c, sq) for sq in range(64))
+                           for c in (Color.WHITE, Color.BLACK))
+
+
+def _pawn_pushes(color: int, sq: int) -> tuple:
+    """(single push, double push) squares of a pawn on sq, -1 where there is none"""
+    direction = 8 if color == Color.WHITE else -8
+    start_rank = 1 if color == Color.WHITE else 6
+    one = sq + direction if 0 <= sq + direction < 64 else -1
+    two = sq + 2 * direction if (sq >> 3) == start_rank else -1
+    return one, two
+
+
+# PAWN_FWD1/PAWN_FWD2[color][sq]: push targets, -1 if off-board or not on the
+# start rank. The double push still needs the pawn's unmoved_pawns bit.
+PAWN_FWD1 = tuple(tuple(_pawn_pushes(c, sq)[0] for sq in range(64))
+                  for c in (Color.WHITE, Color.BLACK))
+PAWN_FWD2 = tuple(tuple(_pawn_pushes(c, sq)[1] for sq in range(64))
+                  for c in (Color.WHITE, Color.BLACK))
+
+
+def _ray(sq: int, direction: int) -> tuple:
+    """Squares from sq (exclusive) to the board edge in one direction"""
+    ray = []
+    current = sq
+    while True:
+        prev = current
+        current += direction
+        if not (0 <= current < 64) or abs((current & 7) - (prev & 7)) > 1:
+            break
+        ray.append(current)
+    return tuple(ray)
+
+
+# RAYS[direction][sq] and its bitboard RAY_MASKS[direction][sq]. A slider's
+# targets along a ray run up to the nearest occupied square: the lowest set
+# bit of occupied & mask for positive directions, the highest for negative.
+RAYS = {d: tuple(_ray(sq, d) for sq in range(64)) for d in QUEEN_DIRECTIONS}
+RAY_MASKS = {d: tuple(sum(1 << t for t in ray) for ray in RAYS[d]) for d in QUEEN_DIRECTIONS}
+
+
+def _slider_rays(directions: List[int]) -> tuple:
+    """Per square: (ray, ray mask, direction) for each direction that has
+    at least one square, so the slider loops skip rays off the board edge"""
+    return tuple(tuple((RAYS[d][sq], RAY_MASKS[d][sq], d) for d in directions if RAYS[d][sq])
+                 for sq in range(64))
+
+
+BISHOP_RAYS = _slider_rays(BISHOP_DIRECTIONS)
+ROOK_RAYS = _slider_rays(ROOK_DIRECTIONS)
+QUEEN_RAYS = _slider_rays(QUEEN_DIRECTIONS)
+
+# All squares on the diagonals / lines through sq: a slider off them can't
+# attack sq whatever the blockers
+BISHOP_LINES = tuple(sum(mask for _, mask, _ in BISHOP_RAYS[sq]) for sq in range(64))
+ROOK_LINES = tuple(sum(mask for _, mask, _ in ROOK_RAYS[sq]) for sq in range(64))
+
+# Per piece type (indexed by piece & 7): slider rays, or the target table
+# of a stepping piece. Pawns are generated separately.
+_NO_TARGETS = ((),) * 64
+PIECE_RAYS = (None, None, None, BISHOP_RAYS, ROOK_RAYS, QUEEN_RAYS, None, None)
+PIECE_STEP_TABLES = (_NO_TARGETS, _NO_TARGETS, KNIGHT_TABLE, None, None,
+                     None, KING_TABLE, _NO_TARGETS)
+_NO_MASK = (0,) * 64
+PIECE_STEP_MASKS = (_NO_MASK, _NO_MASK, KNIGHT_MASK, None, None, None, KING_MASK, _NO_MASK)
+
+# Every square a piece (or stack) can reach from sq: queen lines + knight jumps
+_REACH_MASK = tuple(KNIGHT_MASK[sq] | sum(RAY_MASKS[d][sq] for d in QUEEN_DIRECTIONS)
+                    for sq in range(64))
+
+
+def _move_pool(move_type: MoveType, unklik_index: int = 0) -> tuple:
+    """pool[from_sq][to_sq]: one shared Move per reachable square pair"""
+    return tuple(tuple(Move(sq, to, move_type, unklik_index) if (_REACH_MASK[sq] >> to) & 1 else None
+                       for to in range(64))
+                 for sq in range(64))
+
+
+# Moves are never mutated, so the generators hand out shared instances for
+# the common move kinds instead of constructing a Move per target.
+# _MOVE_POOL is indexed by move type (NORMAL, CAPTURE, KLIK, EN_PASSANT);
+# the unklik pools by the index of the piece leaving the stack.
+_MOVE_POOL = tuple(_move_pool(mt) if mt in (MoveType.NORMAL, MoveType.CAPTURE,
+                                            MoveType.KLIK, MoveType.EN_PASSANT) else None
+                   for mt in MoveType if mt <= MoveType.EN_PASSANT)
+_UNKLIK_POOL = (_move_pool(MoveType.UNKLIK, 0), _move_pool(MoveType.UNKLIK, 1))
+_UNKLIK_KLIK_POOL = (_move_pool(MoveType.UNKLIK_KLIK, 0), _move_pool(MoveType.UNKLIK_KLIK, 1))
+
+
+# Move type groups for fast membership tests
+_PROMOTION_TYPES = frozenset({MoveType.PROMOTION, MoveType.PROMOTION_CAPTURE})
+_UNKLIK_TYPES = frozenset({MoveType.UNKLIK, MoveType.UNKLIK_KLIK})
+_CASTLE_TYPES = frozenset({MoveType.CASTLE_K, MoveType.CASTLE_Q,
+                           MoveType.CASTLE_K_KLIK, MoveType.CASTLE_Q_KLIK})
+_CASTLE_KINGSIDE_TYPES = frozenset({MoveType.CASTLE_K, MoveType.CASTLE_K_KLIK})
+_CASTLE_KLIK_TYPES = frozenset({MoveType.CASTLE_K_KLIK, MoveType.CASTLE_Q_KLIK})
+_CAPTURE_TYPES = frozenset({MoveType.CAPTURE, MoveType.EN_PASSANT, MoveType.PROMOTION_CAPTURE})
+_WHOLE_STACK_TYPES = frozenset({MoveType.NORMAL, MoveType.CAPTURE, MoveType.KLIK})
+# Whatever make_move has no dedicated branch for: normal moves and captures
+# (and PROMOTION_KLIK, which is never generated)
+_PLAIN_TYPES = (frozenset(MoveType) - _CASTLE_TYPES - _UNKLIK_TYPES - _PROMOTION_TYPES
+                - {MoveType.KLIK, MoveType.EN_PASSANT})
+
+
+# Generated move lists by position. The Zobrist key does not cover
+# unmoved_pawns (double-push rights), so the mover's mask is part of the key.
+MOVE_CACHE_SIZE = 1 << 16
+_move_cache: dict = {}   # (zobrist key, color, unmoved pawns, flags) -> moves
+
+
+def clear_move_cache():
+    """Empty the generate_moves() cache"""
+    _move_cache.clear()
 
 
 # Undo info for make/unmake
 class UndoInfo:
     __slots__ = ['modified', 'castling', 'ep_square', 'halfmove_clock',
                  'king_sq_w', 'king_sq_b', 'fullmove',
-                 'unmoved_pawns_w', 'unmoved_pawns_b', 'zobrist_hash']
+                 'unmoved_pawns_w', 'unmoved_pawns_b', 'zobrist_hash', 'psqt']
 
     def __init__(self):
-        self.modified = []  # list of (sq, old_pieces_list) tuples
+        self.modified = ()  # tuple of (sq, old_pieces_list) pairs
         self.castling = 0
         self.ep_square = None
         self.halfmove_clock = 0
@@ -69,33 +228,68 @@ class UndoInfo:
         self.unmoved_pawns_w = 0xFF
         self.unmoved_pawns_b = 0xFF
         self.zobrist_hash = 0
+        self.psqt = 0
 
 
-def sliding_moves(board: Board, sq: int, directions: List[int]) -> List[int]:
-    """Generate sliding piece moves (bishop, rook, queen)"""
+def sliding_moves(board: Board, sq: int, rays: tuple) -> List[int]:
+    """
+    Generate sliding piece moves (bishop, rook, queen).
+    rays is the piece's ray table: BISHOP_RAYS, ROOK_RAYS or QUEEN_RAYS.
+    """
     moves = []
-    squares = board.squares
+    occupied = board.occupied
+
+    for ray, mask, direction in rays[sq]:
+        blockers = occupied & mask
+        if not blockers:
+            moves.extend(ray)
+        # Up to and including the nearest piece (can capture or klik, but
+        # can't go further)
+        elif direction > 0:
+            moves.extend(ray[:((blockers & -blockers).bit_length() - 1 - sq) // direction])
+        else:
+            moves.extend(ray[:(blockers.bit_length() - 1 - sq) // direction])
 
-    for direction in directions:
-        current = sq
+    return moves
 
-        while True:
-            prev = current
-            current += direction
-            if not (0 <= current < 64):
-                break
 
-            # Check for wrap-around
-            if abs((current & 7) - (prev & 7)) > 1:
-                break
+def sliding_blockers(board: Board, sq: int, rays: tuple) -> List[int]:
+    """
+    Nearest occupied square on each of the piece's rays: the only targets a
+    slider can capture on, so captures-only generation skips the empty ones.
+    """
+    targets = []
+    occupied = board.occupied
+
+    for _, mask, direction in rays[sq]:
+        blockers = occupied & mask
+        if blockers:
+            if direction > 0:
+                targets.append((blockers & -blockers).bit_length() - 1)
+            else:
+                targets.append(blockers.bit_length() - 1)
 
-            moves.append(current)
+    return targets
 
-            # Stop if there's a piece (can capture or klik, but can't go further)
-            if squares[current].pieces:
-                break
 
-    return moves
+def sliding_mask(board: Board, sq: int, rays: tuple) -> int:
+    """sliding_moves() as a bitboard"""
+    targets = 0
+    occupied = board.occupied
+
+    for _, mask, direction in rays[sq]:
+        blockers = occupied & mask
+        if not blockers:
+            targets |= mask
+        else:
+            # Cut the ray behind the nearest piece
+            if direction > 0:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            targets |= mask ^ RAY_MASKS[direction][blocker]
+
+    return targets
 
 
 def pawn_moves(board: Board, sq: int, color: Color, captures_only: bool = False,
@@ -107,69 +301,57 @@ def pawn_moves(board: Board, sq: int, color: Color, captures_only: bool = False,
     Uses unmoved_pawns bitmask for double-move eligibility.
     """
     moves = []
-    direction = 1 if color == Color.WHITE else -1
-    start_rank = 1 if color == Color.WHITE else 6
-    promo_rank = 7 if color == Color.WHITE else 0
-    rank = sq >> 3
-    file = sq & 7
+    squares = board.squares
+    promo_rank = 7 if color == _WHITE else 0
 
     if not captures_only:
         # Forward move
-        one_forward = sq + 8 * direction
-        if 0 <= one_forward < 64:
-            fwd_pieces = board.squares[one_forward].pieces
+        one_forward = PAWN_FWD1[color][sq]
+        if one_forward >= 0:
+            fwd_pieces = squares[one_forward].pieces
             if not fwd_pieces:
                 # Empty square - normal forward move
                 if (one_forward >> 3) == promo_rank:
-                    moves.append((one_forward, MoveType.PROMOTION))
+                    moves.append((one_forward, _PROMOTION))
                 else:
-                    moves.append((one_forward, MoveType.NORMAL))
+                    moves.append((one_forward, _NORMAL))
 
                     # Double move from start (only if pawn hasn't moved)
-                    if rank == start_rank and (board.unmoved_pawns[color] & (1 << file)):
-                        two_forward = sq + 16 * direction
-                        if 0 <= two_forward < 64:
-                            two_fwd_pieces = board.squares[two_forward].pieces
-                            if not two_fwd_pieces:
-                                moves.append((two_forward, MoveType.NORMAL))
-                            elif include_klik and len(two_fwd_pieces) < 2 and \
-                                 piece_color(two_fwd_pieces[-1]) == color and \
-                                 piece_type(two_fwd_pieces[-1]) != PieceType.KING:
-                                # Double forward klik onto friendly piece
-                                moves.append((two_forward, MoveType.KLIK))
+                    two_forward = PAWN_FWD2[color][sq]
+                    if two_forward >= 0 and (board.unmoved_pawns[color] & (1 << (sq & 7))):
+                        two_fwd_pieces = squares[two_forward].pieces
+                        if not two_fwd_pieces:
+                            moves.append((two_forward, _NORMAL))
+                        elif include_klik and len(two_fwd_pieces) < 2 and \
+                             (two_fwd_pieces[-1] >> 3) == color and \
+                             (two_fwd_pieces[-1] & 7) != _KING:
+                            # Double forward klik onto friendly piece
+                            moves.append((two_forward, _KLIK))
 
             elif include_klik and len(fwd_pieces) < 2 and \
-                 piece_color(fwd_pieces[-1]) == color and \
-                 piece_type(fwd_pieces[-1]) != PieceType.KING:
+                 (fwd_pieces[-1] >> 3) == color and \
+                 (fwd_pieces[-1] & 7) != _KING:
                 # Forward klik onto friendly piece (not to promotion rank)
                 if (one_forward >> 3) != promo_rank:
-                    moves.append((one_forward, MoveType.KLIK))
+                    moves.append((one_forward, _KLIK))
 
     # Captures (diagonal)
-    for df in (-1, 1):
-        to_file = file + df
-        if not (0 <= to_file < 8):
-            continue
-
-        to_sq = sq + 8 * direction + df
-        if not (0 <= to_sq < 64):
-            continue
-
+    for to_sq in PAWN_CAPTURE_TABLE[color][sq]:
         target_rank = to_sq >> 3
 
         # Normal capture
-        target_pieces = board.squares[to_sq].pieces
+        target_pieces = squares[to_sq].pieces
         if target_pieces:
-            target_color = piece_color(target_pieces[-1])
+            target_color = target_pieces[-1] >> 3
             if target_color != color:
                 if target_rank == promo_rank:
-                    moves.append((to_sq, MoveType.PROMOTION_CAPTURE))
+                    moves.append((to_sq, _PROMOTION_CAPTURE))
                 else:
-                    moves.append((to_sq, MoveType.CAPTURE))
+                    moves.append((to_sq, _CAPTURE))
 
         # En passant
         if to_sq == board.ep_square:
-            moves.append((to_sq, MoveType.EN_PASSANT))
+            moves.append((to_sq, _EN_PASSANT))
 
     return moves
 
@@ -181,49 +363,51 @@ def generate_piece_moves(board: Board, sq: int, piece: Piece,
     Generate all moves for a specific piece at a square.
     """
     moves = []
-    color = piece_color(piece)
-    pt = piece_type(piece)
+    squares = board.squares
+    # Piece codes carry the colour in bit 3 and the type in bits 0-2
+    color = piece >> 3
+    pt = piece & 7
 
     # Get raw move squares based on piece type
-    if pt == PieceType.KNIGHT:
-        targets = KNIGHT_TABLE[sq]
-    elif pt == PieceType.BISHOP:
-        targets = sliding_moves(board, sq, BISHOP_DIRECTIONS)
-    elif pt == PieceType.ROOK:
-        targets = sliding_moves(board, sq, ROOK_DIRECTIONS)
-    elif pt == PieceType.QUEEN:
-        targets = sliding_moves(board, sq, QUEEN_DIRECTIONS)
-    elif pt == PieceType.KING:
-        targets = KING_TABLE[sq]
-    elif pt == PieceType.PAWN:
+    if pt == _PAWN:
         # Pawn has special move generation
         for to_sq, move_type in pawn_moves(board, sq, color, captures_only):
-            if move_type in (MoveType.PROMOTION, MoveType.PROMOTION_CAPTURE):
-                for promo in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT):
+            if move_type in _PROMOTION_TYPES:
+                for promo in _PROMOTION_PIECES:
                     moves.append(Move(sq, to_sq, move_type, promotion=promo))
             else:
-                moves.append(Move(sq, to_sq, move_type))
+                moves.append(_MOVE_POOL[move_type][sq][to_sq])
         return moves
+
+    rays = PIECE_RAYS[pt]
+    if rays:
+        if captures_only:
+            targets = sliding_blockers(board, sq, rays)
+        else:
+            targets = sliding_moves(board, sq, rays)
     else:
-        return moves
+        targets = PIECE_STEP_TABLES[pt][sq]
 
     # Convert target squares to moves
+    normal = _MOVE_POOL[_NORMAL][sq]
+    capture = _MOVE_POOL[_CAPTURE][sq]
+    klik = _MOVE_POOL[_KLIK][sq]
     for to_sq in targets:
-        target_pieces = board.squares[to_sq].pieces
+        target_pieces = squares[to_sq].pieces
 
         if not target_pieces:
             # Empty square - normal move
             if not captures_only:
-                moves.append(Move(sq, to_sq, MoveType.NORMAL))
+                moves.append(normal[to_sq])
 
-        elif piece_color(target_pieces[-1]) != color:
+        elif (target_pieces[-1] >> 3) != color:
             # Enemy piece - capture
-            moves.append(Move(sq, to_sq, MoveType.CAPTURE))
+            moves.append(capture[to_sq])
 
         elif not captures_only and include_klik and len(target_pieces) < 2:
             # Friendly piece without stack - klik (but NOT for king!)
-            if pt != PieceType.KING and piece_type(target_pieces[-1]) != PieceType.KING:
-                moves.append(Move(sq, to_sq, MoveType.KLIK))
+            if pt != _KING and (target_pieces[-1] & 7) != _KING:
+                moves.append(klik[to_sq])
 
     return moves
 
@@ -239,162 +423,336 @@ def generate_combined_moves(board: Board, sq: int, pieces: list,
       - Combined stack can't klik (would exceed 2 piece max)
     """
     moves = []
-    color = piece_color(pieces[0])
+    color = pieces[0] >> 3
     squares = board.squares
 
     has_pawn = False
     pawn_piece = None
     for p in pieces:
-        if piece_type(p) == PieceType.PAWN:
+        if (p & 7) == _PAWN:
             has_pawn = True
             pawn_piece = p
             break
 
-    back_rank = 0 if color == Color.WHITE else 7
-    promo_rank = 7 if color == Color.WHITE else 0
+    back_rank = 0 if color == _WHITE else 7
+    promo_rank = 7 if color == _WHITE else 0
 
-    # Collect target squares from all pieces, tracking which came from pawn
-    all_targets = set()
-    pawn_targets = set()
+    # Collect target squares from all pieces as bitboards, tracking which
+    # came from pawn movement
+    all_bb = 0
+    pawn_bb = 0
 
     for piece in pieces:
-        pt = piece_type(piece)
-        if pt == PieceType.PAWN:
-            direction = 1 if color == Color.WHITE else -1
-            start_rank = 1 if color == Color.WHITE else 6
-            rank = sq >> 3
-            file = sq & 7
-
+        pt = piece & 7
+        if pt == _PAWN:
             if not captures_only:
                 # Forward move
-                one_forward = sq + 8 * direction
-                if 0 <= one_forward < 64 and not squares[one_forward].pieces:
-                    pawn_targets.add(one_forward)
-                    all_targets.add(one_forward)
+                one_forward = PAWN_FWD1[color][sq]
+                if one_forward >= 0 and not squares[one_forward].pieces:
+                    pawn_bb |= 1 << one_forward
                     # Double forward from start
-                    if rank == start_rank and (board.unmoved_pawns[color] & (1 << file)):
-                        two_forward = sq + 16 * direction
-                        if 0 <= two_forward < 64 and not squares[two_forward].pieces:
-                            pawn_targets.add(two_forward)
-                            all_targets.add(two_forward)
-
-            # Diagonal captures
-            for df in (-1, 1):
-                to_file = file + df
-                if 0 <= to_file < 8:
-                    to_sq = sq + 8 * direction + df
-                    if 0 <= to_sq < 64:
-                        target_pieces = squares[to_sq].pieces
-                        if target_pieces and piece_color(target_pieces[-1]) != color:
-                            pawn_targets.add(to_sq)
-                            all_targets.add(to_sq)
-                        # En passant
-                        if to_sq == board.ep_square:
-                            pawn_targets.add(to_sq)
-                            all_targets.add(to_sq)
-
-        elif pt == PieceType.KNIGHT:
-            for t in KNIGHT_TABLE[sq]:
-                all_targets.add(t)
-        elif pt == PieceType.BISHOP:
-            for t in sliding_moves(board, sq, BISHOP_DIRECTIONS):
-                all_targets.add(t)
-        elif pt == PieceType.ROOK:
-            for t in sliding_moves(board, sq, ROOK_DIRECTIONS):
-                all_targets.add(t)
-        elif pt == PieceType.QUEEN:
-            for t in sliding_moves(board, sq, QUEEN_DIRECTIONS):
-                all_targets.add(t)
-        elif pt == PieceType.KING:
-            # King should never be in a stack, but handle gracefully
-            for t in KING_TABLE[sq]:
-                all_targets.add(t)
+                    two_forward = PAWN_FWD2[color][sq]
+                    if two_forward >= 0 and (board.unmoved_pawns[color] & (1 << (sq & 7))) \
+                       and not squares[two_forward].pieces:
+                        pawn_bb |= 1 << two_forward
+
+            # Diagonal captures and en passant
+            for to_sq in PAWN_CAPTURE_TABLE[color][sq]:
+                target_pieces = squares[to_sq].pieces
+                if (target_pieces and (target_pieces[-1] >> 3) != color) or \
+                   to_sq == board.ep_square:
+                    pawn_bb |= 1 << to_sq
+
+        elif PIECE_RAYS[pt]:
+            all_bb |= sliding_mask(board, sq, PIECE_RAYS[pt])
+        else:
+            # (a king should never be in a stack, but is handled gracefully)
+            all_bb |= PIECE_STEP_MASKS[pt][sq]
+    all_bb |= pawn_bb
+
+    # Back rank restriction: pawn can't go to own back rank
+    if has_pawn:
+        all_bb &= ~(0xFF << (back_rank * 8))
 
     # Convert targets to moves with restrictions
-    for to_sq in all_targets:
-        to_rank = to_sq >> 3
+    while all_bb:
+        lsb = all_bb & -all_bb
+        all_bb ^= lsb
+        to_sq = lsb.bit_length() - 1
         target_pieces = squares[to_sq].pieces
 
-        # Back rank restriction: pawn can't go to own back rank
-        if has_pawn and to_rank == back_rank:
-            continue
-
         # Carried-to-promo restriction: pawn can't be carried to promo rank
         # by non-pawn movement. Only allowed if target came from pawn movement.
-        if has_pawn and to_rank == promo_rank:
-            if to_sq not in pawn_targets:
+        if has_pawn and (to_sq >> 3) == promo_rank:
+            if not pawn_bb & lsb:
                 continue
             # Pawn reaches promo rank via own movement → combined promotion
             if not target_pieces:
-                for promo in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT):
-                    moves.append(Move(sq, to_sq, MoveType.PROMOTION,
+                for promo in _PROMOTION_PIECES:
+                    moves.append(Move(sq, to_sq, _PROMOTION,
                                       unklik_index=-1, promotion=promo))
-            elif piece_color(target_pieces[-1]) != color:
-                for promo in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT):
-                    moves.append(Move(sq, to_sq, MoveType.PROMOTION_CAPTURE,
+            elif (target_pieces[-1] >> 3) != color:
+                for promo in _PROMOTION_PIECES:
+                    moves.append(Move(sq, to_sq, _PROMOTION_CAPTURE,
                                       unklik_index=-1, promotion=promo))
             continue
 
         # En passant (combined)
-        if to_sq == board.ep_square and to_sq in pawn_targets:
-            moves.append(Move(sq, to_sq, MoveType.EN_PASSANT, unklik_index=-1))
+        if to_sq == board.ep_square and pawn_bb & lsb:
+            moves.append(Move(sq, to_sq, _EN_PASSANT, unklik_index=-1))
             continue
 
         if not target_pieces:
             # Empty square - normal combined move
             if not captures_only:
-                moves.append(Move(sq, to_sq, MoveType.NORMAL))
-        elif piece_color(target_pieces[-1]) != color:
+                moves.append(_MOVE_POOL[_NORMAL][sq][to_sq])
+        elif (target_pieces[-1] >> 3) != color:
             # Enemy piece - capture
-            moves.append(Move(sq, to_sq, MoveType.CAPTURE))
+            moves.append(_MOVE_POOL[_CAPTURE][sq][to_sq])
         # Friendly piece: can't klik as combined (would exceed 2 piece max)
 
     return moves
 
 
 def generate_moves(board: Board, legal_only: bool = True,
-                   captures_only: bool = False) -> List[Move]:
+                   captures_only: bool = False, side: Color = None) -> List[Move]:
     """
-    Generate all moves for the side to move.
-    If legal_only is True, filter out moves that leave king in check.
+    Generate all moves for the side to move (or for `side`, if given).
+    If legal_only is True, filter out moves that leave king in check;
+    that filter plays the moves, so it needs side == board.turn.
+    Results are cached by position; the caller gets its own list.
     """
+    color = board.turn if side is None else Color(side)
+    if legal_only and color != board.turn:
+        raise ValueError("Legal move generation is only possible for the side to move")
+
+    key = (board.zobrist_hash, color, board.unmoved_pawns[color], legal_only, captures_only)
+    moves = _move_cache.get(key)
+    if moves is None:
+        moves = tuple(_generate_moves(board, color, legal_only, captures_only))
+        if len(_move_cache) >= MOVE_CACHE_SIZE:
+            # FIFO: dicts keep insertion order, so the first key is the oldest.
+            # No lock: server threads share the cache, so another thread may
+            # evict the same key (or empty the cache) first; pop tolerates that
+            try:
+                _move_cache.pop(next(iter(_move_cache), None), None)
+            except RuntimeError:
+                pass  # Another thread resized the dict while we looked
+        _move_cache[key] = moves
+    return list(moves)
+
+
+def _generate_moves(board: Board, color: Color, legal_only: bool,
+                    captures_only: bool) -> List[Move]:
+    """Uncached generate_moves() for color"""
     moves = []
-    color = board.turn
+    squares = board.squares
+    stack_bb = board.stack_bb
+
+    # Single pieces of the side to move, then its stacks (each ascending)
+    occ = board.occ[color]
+    bb = occ & ~stack_bb
+    while bb:
+        lsb = bb & -bb
+        bb ^= lsb
+        sq = lsb.bit_length() - 1
+        moves.extend(generate_piece_moves(board, sq, squares[sq].pieces[0],
+                                           captures_only=captures_only))
+
+    bb = occ & stack_bb
+    while bb:
+        lsb = bb & -bb
+        bb ^= lsb
+        sq = lsb.bit_length() - 1
+        friendly_pieces = [(idx, p) for idx, p in enumerate(squares[sq].pieces)
+                           if (p >> 3) == color]
+
+        # Generate unklik moves for each friendly piece
+        for idx, piece in friendly_pieces:
+            moves.extend(generate_unklik_moves(board, sq, idx, piece, captures_only))
+
+        # Generate combined moves if both pieces are friendly
+        if len(friendly_pieces) == 2:
+            moves.extend(generate_combined_moves(
+                board, sq, [p for _, p in friendly_pieces], captures_only))
 
-    for sq in range(64):
-        stack = board.squares[sq]
-        if not stack.pieces:
-            continue
+    # Add castling moves (not during captures-only)
+    if not captures_only:
+        moves.extend(generate_castling_moves(board, color))
+
+    if legal_only:
+        moves = _filter_legal(board, moves, color)
 
-        # Check if any piece belongs to side to move
-        if len(stack.pieces) >= 2:
-            # Stacked position
-            friendly_pieces = [(idx, p) for idx, p in enumerate(stack.pieces)
-                               if piece_color(p) == color]
+    return moves
 
-            # Generate unklik moves for each friendly piece
-            for idx, piece in friendly_pieces:
-                moves.extend(generate_unklik_moves(board, sq, idx, piece, captures_only))
 
-            # Generate combined moves if both pieces are friendly
-            if len(friendly_pieces) == 2:
-                moves.extend(generate_combined_moves(
-                    board, sq, [p for _, p in friendly_pieces], captures_only))
+# King moves that only relocate the king (castling also moves a rook)
+_KING_STEP_TYPES = frozenset({_NORMAL, _CAPTURE})
+
+
+def _filter_legal(board: Board, moves: List[Move], color: Color) -> List[Move]:
+    """
+    Drop the moves that leave color's king in check.
+    Out of check, a move by any piece but the king can only expose the king
+    by vacating a square on a line to an enemy slider. Such "pinned" squares
+    are found once, and only king moves, en passant and moves off a pin ray
+    are played out with is_legal.
+    In check, a move by any other piece must land on the checker or between
+    it and the king (nowhere in double check); only those are played out.
+    A king step onto an empty square or a single piece is safe iff the
+    target isn't attacked with the king lifted off the board.
+    """
+    king_sq = board.king_sq[color]
+    enemy = color ^ 1
+    if king_sq == _NO_SQUARE:
+        return [m for m in moves if is_legal(board, m)]
+    no_king = board.occupied ^ (1 << king_sq)
+    stack_bb = board.stack_bb
+    if is_attacked(board, king_sq, enemy):
+        blocks = _check_blocks(board, king_sq, enemy)
+        legal = []
+        for m in moves:
+            if m.from_sq == king_sq:
+                if m.move_type in _KING_STEP_TYPES and not (stack_bb >> m.to_sq) & 1:
+                    if not is_attacked(board, m.to_sq, enemy, no_king):
+                        legal.append(m)
+                elif is_legal(board, m):
+                    legal.append(m)
+            elif (m.move_type == _EN_PASSANT or (blocks >> m.to_sq) & 1) and \
+                 is_legal(board, m):
+                legal.append(m)
+        return legal
+
+    pins = _pin_rays(board, king_sq, enemy)
+    legal = []
+    for m in moves:
+        from_sq = m.from_sq
+        if from_sq == king_sq and m.move_type in _KING_STEP_TYPES and \
+           not (stack_bb >> m.to_sq) & 1:
+            if not is_attacked(board, m.to_sq, enemy, no_king):
+                legal.append(m)
+        elif m.move_type in _CASTLE_TYPES:
+            legal.append(m)  # generate_castling_moves checks every square
+        elif from_sq == king_sq or m.move_type == _EN_PASSANT:
+            if is_legal(board, m):
+                legal.append(m)
+        elif from_sq in pins and not (pins[from_sq] >> m.to_sq) & 1:
+            # Leaves the pin ray; still fine if a stack partner stays behind
+            if is_legal(board, m):
+                legal.append(m)
         else:
-            # Single piece - generate normal moves
-            piece = stack.pieces[0]
-            if piece_color(piece) == color:
-                moves.extend(generate_piece_moves(board, sq, piece,
-                                                   captures_only=captures_only))
+            legal.append(m)
+    return legal
 
-    # Add castling moves (not during captures-only)
-    if not captures_only:
-        moves.extend(generate_castling_moves(board))
 
-    if legal_only:
-        moves = [m for m in moves if is_legal(board, m)]
+def _check_blocks(board: Board, king_sq: int, by_color: Color) -> int:
+    """
+    Squares that answer a single check on king_sq by by_color when a piece
+    lands there: the checker and, for a slider, the squares in between.
+    0 in double check, i.e. checkers on two different squares; both pieces
+    of one stack giving check still count as a single checker.
+    """
+    top = board.bb[by_color]
+    bottom = board.bottom[by_color]
+
+    checkers = (KNIGHT_MASK[king_sq] & (top[_KNIGHT] | bottom[_KNIGHT]) |
+                PAWN_ATTACKER_MASK[by_color][king_sq] & (top[_PAWN] | bottom[_PAWN]))
+    blocks = checkers
+
+    occupied = board.occupied
+    diagonal = (top[_BISHOP] | top[_QUEEN] |
+                bottom[_BISHOP] | bottom[_QUEEN]) & BISHOP_LINES[king_sq]
+    straight = (top[_ROOK] | top[_QUEEN] |
+                bottom[_ROOK] | bottom[_QUEEN]) & ROOK_LINES[king_sq]
+    for sliders, rays in ((diagonal, BISHOP_RAYS), (straight, ROOK_RAYS)):
+        if not sliders:
+            continue
+        for _, ray_mask, direction in rays[king_sq]:
+            blockers = occupied & ray_mask
+            if not sliders & blockers:
+                continue
+            if direction > 0:
+                nearest = blockers & -blockers
+            else:
+                nearest = 1 << (blockers.bit_length() - 1)
+            if sliders & nearest:
+                checkers |= nearest
+                blocks |= ray_mask & ~RAY_MASKS[direction][nearest.bit_length() - 1]
+
+    return blocks if checkers.bit_count() == 1 else 0
 
-    return moves
+
+def _pin_rays(board: Board, king_sq: int, by_color: Color) -> dict:
+    """
+    Map each square that is the only blocker between king_sq and a slider of
+    by_color to its pin ray: the squares up to and including the slider.
+    """
+    pins = {}
+    occupied = board.occupied
+    top = board.bb[by_color]
+    bottom = board.bottom[by_color]
+    diagonal = (top[_BISHOP] | top[_QUEEN] |
+                bottom[_BISHOP] | bottom[_QUEEN])
+    straight = (top[_ROOK] | top[_QUEEN] |
+                bottom[_ROOK] | bottom[_QUEEN])
+
+    for sliders, rays in ((diagonal, BISHOP_RAYS), (straight, ROOK_RAYS)):
+        if not sliders:
+            continue
+        for _, ray_mask, direction in rays[king_sq]:
+            blockers = occupied & ray_mask
+            if not sliders & blockers:
+                continue
+            # Nearest blocker, then the one behind it
+            if direction > 0:
+                first = blockers & -blockers
+                blockers ^= first
+                second = blockers & -blockers
+            else:
+                first = 1 << (blockers.bit_length() - 1)
+                blockers ^= first
+                second = 1 << (blockers.bit_length() - 1) if blockers else 0
+            if sliders & second:
+                pinner_sq = second.bit_length() - 1
+                pins[first.bit_length() - 1] = ray_mask & ~RAY_MASKS[direction][pinner_sq]
+    return pins
+
+
+def count_pseudo_moves(board: Board) -> List[int]:
+    """
+    Count pseudo-legal moves for both colors in one walk over the occupied
+    squares. Returns [white_count, black_count]; each matches
+    len(generate_moves(board, legal_only=False, side=color)).
+    """
+    counts = [0, 0]
+    squares = board.squares
+    stack_bb = board.stack_bb
+
+    bb = board.occupied
+    while bb:
+        lsb = bb & -bb
+        sq = lsb.bit_length() - 1
+        bb ^= lsb
+        pieces = squares[sq].pieces
+
+        if stack_bb & lsb:
+            bottom, top = pieces
+            n_bottom = len(generate_unklik_moves(board, sq, 0, bottom))
+            n_top = len(generate_unklik_moves(board, sq, 1, top))
+            if (bottom ^ top) & 8:
+                # Mixed stack: each piece only moves for its own side
+                counts[bottom >> 3] += n_bottom
+                counts[top >> 3] += n_top
+            else:
+                counts[bottom >> 3] += n_bottom + n_top + len(
+                    generate_combined_moves(board, sq, [bottom, top]))
+        else:
+            piece = pieces[0]
+            counts[piece >> 3] += len(generate_piece_moves(board, sq, piece))
+
+    counts[0] += len(generate_castling_moves(board, Color.WHITE))
+    counts[1] += len(generate_castling_moves(board, Color.BLACK))
+    return counts
 
 
 def generate_unklik_moves(board: Board, sq: int, piece_idx: int, piece: Piece,
@@ -403,93 +761,134 @@ def generate_unklik_moves(board: Board, sq: int, piece_idx: int, piece: Piece,
     Generate unklik moves for a piece in a stack.
     """
     moves = []
-    color = piece_color(piece)
-    pt = piece_type(piece)
+    squares = board.squares
+    color = piece >> 3
+    pt = piece & 7
+    unklik = _UNKLIK_POOL[piece_idx][sq]
+    unklik_klik = _UNKLIK_KLIK_POOL[piece_idx][sq]
 
     # Get raw move squares based on piece type
-    if pt == PieceType.KNIGHT:
-        targets = KNIGHT_TABLE[sq]
-    elif pt == PieceType.BISHOP:
-        targets = sliding_moves(board, sq, BISHOP_DIRECTIONS)
-    elif pt == PieceType.ROOK:
-        targets = sliding_moves(board, sq, ROOK_DIRECTIONS)
-    elif pt == PieceType.QUEEN:
-        targets = sliding_moves(board, sq, QUEEN_DIRECTIONS)
-    elif pt == PieceType.KING:
-        targets = KING_TABLE[sq]
-    elif pt == PieceType.PAWN:
+    if pt == _PAWN:
         # Pawn unklik moves
         for to_sq, base_type in pawn_moves(board, sq, color, captures_only):
-            target_pieces = board.squares[to_sq].pieces
-
-            if base_type == MoveType.EN_PASSANT:
-                moves.append(Move(sq, to_sq, MoveType.EN_PASSANT, unklik_index=piece_idx))
-            elif base_type in (MoveType.PROMOTION, MoveType.PROMOTION_CAPTURE):
-                is_capture = target_pieces and piece_color(target_pieces[-1]) != color
-                for promo in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT):
-                    mt = MoveType.PROMOTION_CAPTURE if is_capture else MoveType.PROMOTION
+            target_pieces = squares[to_sq].pieces
+
+            if base_type == _EN_PASSANT:
+                moves.append(Move(sq, to_sq, _EN_PASSANT, unklik_index=piece_idx))
+            elif base_type in _PROMOTION_TYPES:
+                is_capture = target_pieces and (target_pieces[-1] >> 3) != color
+                for promo in _PROMOTION_PIECES:
+                    mt = _PROMOTION_CAPTURE if is_capture else _PROMOTION
                     moves.append(Move(sq, to_sq, mt, unklik_index=piece_idx, promotion=promo))
             elif not target_pieces:
                 if not captures_only:
-                    moves.append(Move(sq, to_sq, MoveType.UNKLIK, unklik_index=piece_idx))
-            elif piece_color(target_pieces[-1]) != color:
-                moves.append(Move(sq, to_sq, MoveType.UNKLIK, unklik_index=piece_idx))
-            elif not captures_only and len(target_pieces) < 2 and piece_type(target_pieces[-1]) != PieceType.KING:
-                promo_rank = 7 if color == Color.WHITE else 0
+                    moves.append(unklik[to_sq])
+            elif (target_pieces[-1] >> 3) != color:
+                moves.append(unklik[to_sq])
+            elif not captures_only and len(target_pieces) < 2 and (target_pieces[-1] & 7) != _KING:
+                promo_rank = 7 if color == _WHITE else 0
                 if (to_sq >> 3) != promo_rank:
-                    moves.append(Move(sq, to_sq, MoveType.UNKLIK_KLIK, unklik_index=piece_idx))
+                    moves.append(unklik_klik[to_sq])
         return moves
+
+    rays = PIECE_RAYS[pt]
+    if rays:
+        if captures_only:
+            targets = sliding_blockers(board, sq, rays)
+        else:
+            targets = sliding_moves(board, sq, rays)
     else:
-        return moves
+        targets = PIECE_STEP_TABLES[pt][sq]
 
     # Convert target squares to moves
     for to_sq in targets:
-        target_pieces = board.squares[to_sq].pieces
+        target_pieces = squares[to_sq].pieces
 
         if not target_pieces:
             if not captures_only:
-                moves.append(Move(sq, to_sq, MoveType.UNKLIK, unklik_index=piece_idx))
+                moves.append(unklik[to_sq])
 
-        elif piece_color(target_pieces[-1]) != color:
-            moves.append(Move(sq, to_sq, MoveType.UNKLIK, unklik_index=piece_idx))
+        elif (target_pieces[-1] >> 3) != color:
+            moves.append(unklik[to_sq])
 
         elif not captures_only and len(target_pieces) < 2:
-            if pt != PieceType.KING and piece_type(target_pieces[-1]) != PieceType.KING:
-                moves.append(Move(sq, to_sq, MoveType.UNKLIK_KLIK, unklik_index=piece_idx))
+            if pt != _KING and (target_pieces[-1] & 7) != _KING:
+                moves.append(unklik_klik[to_sq])
 
     return moves
 
 
-def _has_rook(pieces: list, rook_piece: Piece) -> bool:
-    """Check if a rook is anywhere in the stack."""
-    return rook_piece in pieces
+def _has_rook(board: Board, sq: int, color: Color) -> bool:
+    """Check if a rook of color is anywhere in the stack on sq."""
+    return bool(((board.bb[color][_ROOK] |
+                  board.bottom[color][_ROOK]) >> sq) & 1)
 
 
-def generate_castling_moves(board: Board) -> List[Move]:
+def _castle_sides(color: Color) -> tuple:
+    """
+    Per castling side of color: (rights bit, rook corner, square the king
+    passes and the rook lands on, king destination, mask of squares that
+    must be empty, castle move, castle-with-rook-klik move)
+    """
+    base = 0 if color == Color.WHITE else 56
+    king_sq = base + 4
+    if color == Color.WHITE:
+        ks_rights, qs_rights = CastlingRights.W_KINGSIDE, CastlingRights.W_QUEENSIDE
+    else:
+        ks_rights, qs_rights = CastlingRights.B_KINGSIDE, CastlingRights.B_QUEENSIDE
+    return (
+        # Kingside: g must be empty (king destination)
+        (ks_rights, base + 7, base + 5, base + 6, 1 << (base + 6),
+         Move(king_sq, base + 6, MoveType.CASTLE_K),
+         Move(king_sq, base + 6, MoveType.CASTLE_K_KLIK)),
+        # Queenside: c (king destination) and b (rook passage) must be empty
+        (qs_rights, base, base + 3, base + 2, (1 << (base + 2)) | (1 << (base + 1)),
+         Move(king_sq, base + 2, MoveType.CASTLE_Q),
+         Move(king_sq, base + 2, MoveType.CASTLE_Q_KLIK)),
+    )
+
+
+_CASTLE_SIDES = (_castle_sides(Color.WHITE), _castle_sides(Color.BLACK))
+_CASTLE_RIGHTS = (CastlingRights.WHITE, CastlingRights.BLACK)
+
+
+def _castle_keep_masks() -> tuple:
+    """Per square: the castling rights that survive a move from or to it"""
+    keep = [int(CastlingRights.ALL)] * 64
+    for sq, lost in ((Square.E1, CastlingRights.WHITE), (Square.E8, CastlingRights.BLACK),
+                     (Square.A1, CastlingRights.W_QUEENSIDE),
+                     (Square.H1, CastlingRights.W_KINGSIDE),
+                     (Square.A8, CastlingRights.B_QUEENSIDE),
+                     (Square.H8, CastlingRights.B_KINGSIDE)):
+        keep[sq] &= ~lost
+    return tuple(keep)
+
+
+_CASTLE_KEEP = _castle_keep_masks()
+
+
+def generate_castling_moves(board: Board, color: Color = None) -> List[Move]:
     """
     Generate castling moves, including with stacked rooks.
     When rook is stacked on corner, it unkliks and moves to f/d file.
     If f/d file has a friendly piece, rook kliks there (CASTLE_K_KLIK).
+    color defaults to the side to move.
+    The moves returned are fully legal: neither the squares the king
+    crosses nor its destination are attacked.
     """
     moves = []
-    color = board.turn
+    if color is None:
+        color = board.turn
+    rights = board.castling & _CASTLE_RIGHTS[color]
+    if not rights:
+        return moves
     squares = board.squares
-    enemy = color.opposite()
-
-    if color == Color.WHITE:
-        king_sq = Square.E1
-        rook_piece = Piece.W_ROOK
-        base_rank_squares = (Square.A1, Square.B1, Square.C1, Square.D1,
-                             Square.E1, Square.F1, Square.G1, Square.H1)
-    else:
-        king_sq = Square.E8
-        rook_piece = Piece.B_ROOK
-        base_rank_squares = (Square.A8, Square.B8, Square.C8, Square.D8,
-                             Square.E8, Square.F8, Square.G8, Square.H8)
+    enemy = color ^ 1
+    king_sq = Square.E1 if color == _WHITE else Square.E8
 
     # King must be at starting square (not stacked)
     king_pieces = squares[king_sq].pieces
-    if not king_pieces or king_pieces[-1] != make_piece(color, PieceType.KING):
+    if not king_pieces or king_pieces[-1] != make_piece(color, _KING):
         return moves
     if len(king_pieces) > 1:
         return moves  # King can't be in a stack
@@ -498,120 +897,83 @@ def generate_castling_moves(board: Board) -> List[Move]:
     if is_attacked(board, king_sq, enemy):
         return moves
 
-    rook_sq_k = base_rank_squares[7]  # h1/h8
-    rook_sq_q = base_rank_squares[0]  # a1/a8
-    f_sq = base_rank_squares[5]  # f1/f8
-    g_sq = base_rank_squares[6]  # g1/g8
-    d_sq = base_rank_squares[3]  # d1/d8
-    c_sq = base_rank_squares[2]  # c1/c8
-    b_sq = base_rank_squares[1]  # b1/b8
-
-    ks_rights = CastlingRights.W_KINGSIDE if color == Color.WHITE else CastlingRights.B_KINGSIDE
-    qs_rights = CastlingRights.W_QUEENSIDE if color == Color.WHITE else CastlingRights.B_QUEENSIDE
-
-    # Kingside castle
-    if board.castling & ks_rights:
-        rook_pieces = squares[rook_sq_k].pieces
-        if rook_pieces and _has_rook(rook_pieces, rook_piece):
-            # g1 must be empty (king destination)
-            if not squares[g_sq].pieces:
-                # f1 not attacked (king passes through)
-                if not is_attacked(board, f_sq, enemy):
-                    f_pieces = squares[f_sq].pieces
-                    if not f_pieces:
-                        # f1 empty: normal castle (rook goes to f1)
-                        moves.append(Move(king_sq, g_sq, MoveType.CASTLE_K))
-                    elif len(f_pieces) == 1 and piece_color(f_pieces[0]) == color and \
-                         piece_type(f_pieces[0]) != PieceType.KING:
-                        # f1 has friendly non-king piece: rook kliks there
-                        moves.append(Move(king_sq, g_sq, MoveType.CASTLE_K_KLIK))
-
-    # Queenside castle
-    if board.castling & qs_rights:
-        rook_pieces = squares[rook_sq_q].pieces
-        if rook_pieces and _has_rook(rook_pieces, rook_piece):
-            # c1 must be empty (king destination), b1 must be empty (passage)
-            if not squares[c_sq].pieces and not squares[b_sq].pieces:
-                # d1 not attacked (king passes through)
-                if not is_attacked(board, d_sq, enemy):
-                    d_pieces = squares[d_sq].pieces
-                    if not d_pieces:
-                        # d1 empty: normal castle (rook goes to d1)
-                        moves.append(Move(king_sq, c_sq, MoveType.CASTLE_Q))
-                    elif len(d_pieces) == 1 and piece_color(d_pieces[0]) == color and \
-                         piece_type(d_pieces[0]) != PieceType.KING:
-                        # d1 has friendly non-king piece: rook kliks there
-                        moves.append(Move(king_sq, c_sq, MoveType.CASTLE_Q_KLIK))
+    occupied = board.occupied
+    # Squares the rook may klik onto: a lone friendly non-king piece
+    klik_bb = board.occ[color] & ~board.stack_bb & ~board.bb[color][_KING]
+    for side_rights, rook_sq, pass_sq, dest_sq, empty_mask, castle, castle_klik \
+            in _CASTLE_SIDES[color]:
+        if not rights & side_rights or occupied & empty_mask:
+            continue
+        if not _has_rook(board, rook_sq, color):
+            continue
+        if (occupied >> pass_sq) & 1:
+            if not (klik_bb >> pass_sq) & 1:
+                continue
+            move = castle_klik  # Friendly piece on f1/d1: rook kliks onto it
+        else:
+            move = castle       # Empty: normal castle (rook goes to f1/d1)
+        # f1/d1 (king passes through) and g1/c1 not attacked. The pieces
+        # that move never lie between those squares and an attacker.
+        if is_attacked(board, pass_sq, enemy) or is_attacked(board, dest_sq, enemy):
+            continue
+        moves.append(move)
 
     return moves
 
 
-def is_attacked(board: Board, sq: int, by_color: Color) -> bool:
-    """Check if a square is attacked by the given color"""
-    squares = board.squares
+def is_attacked(board: Board, sq: int, by_color: Color, occupied: int = None) -> bool:
+    """
+    Check if a square is attacked by the given color.
+    occupied overrides the board's occupancy for slider blocking, e.g. with
+    the king lifted off to test where it may step.
+    """
+    # Attackers count at either stack level
+    top = board.bb[by_color]
+    bottom = board.bottom[by_color]
 
     # Check knight attacks
-    for attacker_sq in KNIGHT_TABLE[sq]:
-        for piece in squares[attacker_sq].pieces:
-            if piece_color(piece) == by_color and piece_type(piece) == PieceType.KNIGHT:
-                return True
+    if KNIGHT_MASK[sq] & (top[_KNIGHT] | bottom[_KNIGHT]):
+        return True
 
     # Check king attacks
-    for attacker_sq in KING_TABLE[sq]:
-        for piece in squares[attacker_sq].pieces:
-            if piece_color(piece) == by_color and piece_type(piece) == PieceType.KING:
-                return True
+    if KING_MASK[sq] & (top[_KING] | bottom[_KING]):
+        return True
 
-    # Check sliding piece attacks (bishop/queen diagonals)
-    for direction in BISHOP_DIRECTIONS:
-        current = sq
-        while True:
-            prev = current
-            current += direction
-            if not (0 <= current < 64):
-                break
-            if abs((current & 7) - (prev & 7)) > 1:
-                break
+    if occupied is None:
+        occupied = board.occupied
 
-            target_pieces = squares[current].pieces
-            if target_pieces:
-                for piece in target_pieces:
-                    if piece_color(piece) == by_color:
-                        pt = piece_type(piece)
-                        if pt == PieceType.BISHOP or pt == PieceType.QUEEN:
-                            return True
-                break
+    # Check sliding piece attacks (bishop/queen diagonals)
+    diagonal = (top[_BISHOP] | top[_QUEEN] |
+                bottom[_BISHOP] | bottom[_QUEEN]) & BISHOP_LINES[sq]
+    if diagonal:
+        for _, mask, direction in BISHOP_RAYS[sq]:
+            blockers = occupied & mask
+            # Only rays holding such a slider; then it must be the nearest piece
+            if diagonal & blockers:
+                if direction > 0:
+                    blockers &= -blockers
+                else:
+                    blockers = 1 << (blockers.bit_length() - 1)
+                if diagonal & blockers:
+                    return True
 
     # Check sliding piece attacks (rook/queen lines)
-    for direction in ROOK_DIRECTIONS:
-        current = sq
-        while True:
-            prev = current
-            current += direction
-            if not (0 <= current < 64):
-                break
-            if abs((current & 7) - (prev & 7)) > 1:
-                break
-
-            target_pieces = squares[current].pieces
-            if target_pieces:
-                for piece in target_pieces:
-                    if piece_color(piece) == by_color:
-                        pt = piece_type(piece)
-                        if pt == PieceType.ROOK or pt == PieceType.QUEEN:
-                            return True
-                break
+    straight = (top[_ROOK] | top[_QUEEN] |
+                bottom[_ROOK] | bottom[_QUEEN]) & ROOK_LINES[sq]
+    if straight:
+        for _, mask, direction in ROOK_RAYS[sq]:
+            blockers = occupied & mask
+            if straight & blockers:
+                if direction > 0:
+                    blockers &= -blockers
+                else:
+                    blockers = 1 << (blockers.bit_length() - 1)
+                if straight & blockers:
+                    return True
 
     # Check pawn attacks
-    pawn_direction = 1 if by_color == Color.WHITE else -1
-    enemy_pawn = make_piece(by_color, PieceType.PAWN)
-    sq_file = sq & 7
-
-    for df in (-1, 1):
-        attacker_sq = sq - 8 * pawn_direction + df
-        if 0 <= attacker_sq < 64 and abs((attacker_sq & 7) - sq_file) == 1:
-            if enemy_pawn in squares[attacker_sq].pieces:
-                return True
+    if PAWN_ATTACKER_MASK[by_color][sq] & (top[_PAWN] | bottom[_PAWN]):
+        return True
 
     return False
 
@@ -619,15 +981,16 @@ def is_attacked(board: Board, sq: int, by_color: Color) -> bool:
 def is_in_check(board: Board, color: Color) -> bool:
     """Check if the given color's king is in check"""
     king_sq = board.king_sq[color]
-    if king_sq == Square.NONE:
+    if king_sq == _NO_SQUARE:
         return False
-    return is_attacked(board, king_sq, color.opposite())
+    # The attacker colour as a plain int: is_attacked only indexes with it
+    return is_attacked(board, king_sq, color ^ 1)
 
 
 def is_legal(board: Board, move: Move) -> bool:
     """Check if a move is legal (doesn't leave own king in check)"""
     undo = make_move(board, move)
-    legal = not is_in_check(board, board.turn.opposite())
+    legal = not is_in_check(board, board.turn ^ 1)
     unmake_move(board, move, undo)
     return legal
 
@@ -654,38 +1017,92 @@ def make_move(board: Board, move: Move) -> UndoInfo:
     undo.unmoved_pawns_w = board.unmoved_pawns[0]
     undo.unmoved_pawns_b = board.unmoved_pawns[1]
     undo.zobrist_hash = board.zobrist_hash
+    undo.psqt = board.psqt
 
-    # Always save from and to squares
-    undo.modified = [(from_sq, squares[from_sq].pieces[:]),
-                     (to_sq, squares[to_sq].pieces[:])]
+    # Always save from and to squares. The lists are saved by reference:
+    # below, modified squares always get a new list, never an in-place edit
+    undo.modified = ((from_sq, squares[from_sq].pieces),
+                     (to_sq, squares[to_sq].pieces))
 
     # Get the moving piece info BEFORE modifying
     from_pieces = squares[from_sq].pieces
-    if mt in (MoveType.UNKLIK, MoveType.UNKLIK_KLIK):
-        moving_piece_type = piece_type(from_pieces[move.unklik_index]) if 0 <= move.unklik_index < len(from_pieces) else PieceType.NONE
+    if mt in _UNKLIK_TYPES:
+        moving_piece_type = from_pieces[move.unklik_index] & 7 if 0 <= move.unklik_index < len(from_pieces) else 0
     elif move.unklik_index == -1:
         # Combined move: check if any piece is a pawn for halfmove/ep tracking
-        moving_piece_type = PieceType.NONE
+        moving_piece_type = 0
         for p in from_pieces:
-            if piece_type(p) == PieceType.PAWN:
-                moving_piece_type = PieceType.PAWN
+            if (p & 7) == _PAWN:
+                moving_piece_type = _PAWN
                 break
     else:
-        moving_piece_type = piece_type(from_pieces[-1]) if from_pieces else PieceType.NONE
-
-    # Handle different move types
-    if mt in (MoveType.CASTLE_K, MoveType.CASTLE_Q,
-              MoveType.CASTLE_K_KLIK, MoveType.CASTLE_Q_KLIK):
-        is_kingside = mt in (MoveType.CASTLE_K, MoveType.CASTLE_K_KLIK)
-        is_klik = mt in (MoveType.CASTLE_K_KLIK, MoveType.CASTLE_Q_KLIK)
-        rank = 0 if board.turn == Color.WHITE else 7
+        moving_piece_type = from_pieces[-1] & 7 if from_pieces else 0
+
+    # Handle different move types, most frequent first
+    if mt in _PLAIN_TYPES:
+        # Normal move or capture
+        squares[from_sq].pieces = []
+        squares[to_sq].pieces = from_pieces[:]
+
+        for piece in from_pieces:
+            if (piece & 7) == _KING:
+                board.king_sq[board.turn] = to_sq
+
+    elif mt == _KLIK:
+        squares[from_sq].pieces = []
+        squares[to_sq].pieces = squares[to_sq].pieces + from_pieces
+        for piece in from_pieces:
+            if (piece & 7) == _KING:
+                board.king_sq[board.turn] = to_sq
+
+    elif mt in _UNKLIK_TYPES:
+        # Unklik moves leave a 2-stack: the other piece stays behind
+        moving_piece = from_pieces[move.unklik_index]
+        squares[from_sq].pieces = [from_pieces[1 - move.unklik_index]]
+
+        if mt == _UNKLIK_KLIK:
+            squares[to_sq].pieces = squares[to_sq].pieces + [moving_piece]
+        else:
+            squares[to_sq].pieces = [moving_piece]
+
+        if (moving_piece & 7) == _KING:
+            board.king_sq[board.turn] = to_sq
+
+    elif mt in _PROMOTION_TYPES:
+        promoted_piece = int(move.promotion) | (board.turn << 3)
+
+        if move.unklik_index == -1:
+            # Combined promotion: pawn promotes, companion piece comes along
+            companion = None
+            for p in squares[from_sq].pieces:
+                if (p & 7) != _PAWN:
+                    companion = p
+                    break
+            squares[from_sq].pieces = []
+            if companion:
+                squares[to_sq].pieces = [companion, promoted_piece]
+            else:
+                squares[to_sq].pieces = [promoted_piece]
+        elif move.unklik_index > 0 or len(squares[from_sq].pieces) >= 2:
+            # Unklik promotion: one piece leaves stack to promote
+            squares[from_sq].pieces = [from_pieces[1 - move.unklik_index]]
+            squares[to_sq].pieces = [promoted_piece]
+        else:
+            # Simple single-piece promotion
+            squares[from_sq].pieces = []
+            squares[to_sq].pieces = [promoted_piece]
+
+    elif mt in _CASTLE_TYPES:
+        is_kingside = mt in _CASTLE_KINGSIDE_TYPES
+        is_klik = mt in _CASTLE_KLIK_TYPES
+        rank = 0 if board.turn == _WHITE else 7
         rook_from = make_square(7 if is_kingside else 0, rank)
         rook_to = make_square(5 if is_kingside else 3, rank)
-        rook_piece = Piece.W_ROOK if board.turn == Color.WHITE else Piece.B_ROOK
+        rook_piece = Piece.W_ROOK if board.turn == _WHITE else Piece.B_ROOK
 
         # Save extra squares
-        undo.modified.append((rook_from, squares[rook_from].pieces[:]))
-        undo.modified.append((rook_to, squares[rook_to].pieces[:]))
+        undo.modified += ((rook_from, squares[rook_from].pieces),
+                          (rook_to, squares[rook_to].pieces))
 
         king = squares[from_sq].pieces[-1]
 
@@ -698,10 +1115,9 @@ def make_move(board: Board, move: Move) -> UndoInfo:
                 break
 
         if rook_idx is not None:
-            rook = rook_sq_pieces.pop(rook_idx)
+            rook = rook_sq_pieces[rook_idx]
             # If stack had 2 pieces, one remains; if single, square is now empty
-            if not rook_sq_pieces:
-                squares[rook_from].pieces = []
+            squares[rook_from].pieces = rook_sq_pieces[:rook_idx] + rook_sq_pieces[rook_idx + 1:]
         else:
             rook = rook_piece  # Fallback
 
@@ -711,103 +1127,35 @@ def make_move(board: Board, move: Move) -> UndoInfo:
 
         # Place rook (klik onto existing piece or into empty square)
         if is_klik:
-            squares[rook_to].add(rook)
+            squares[rook_to].pieces = squares[rook_to].pieces + [rook]
         else:
             squares[rook_to].pieces = [rook]
 
         board.king_sq[board.turn] = to_sq
 
-    elif mt in (MoveType.UNKLIK, MoveType.UNKLIK_KLIK):
-        moving_piece = squares[from_sq].remove_at(move.unklik_index)
-
-        if mt == MoveType.UNKLIK_KLIK:
-            squares[to_sq].add(moving_piece)
-        else:
-            squares[to_sq].clear()
-            squares[to_sq].pieces = [moving_piece]
-
-        if piece_type(moving_piece) == PieceType.KING:
-            board.king_sq[board.turn] = to_sq
-
-    elif mt == MoveType.KLIK:
-        moving_pieces = squares[from_sq].pieces[:]
-        squares[from_sq].clear()
-        for piece in moving_pieces:
-            squares[to_sq].add(piece)
-            if piece_type(piece) == PieceType.KING:
-                board.king_sq[board.turn] = to_sq
-
-    elif mt == MoveType.EN_PASSANT:
-        captured_sq = to_sq + (-8 if board.turn == Color.WHITE else 8)
-        undo.modified.append((captured_sq, squares[captured_sq].pieces[:]))
-
-        moving_pieces = squares[from_sq].pieces[:]
-        squares[from_sq].clear()
-        squares[captured_sq].clear()
-        squares[to_sq].pieces = moving_pieces
-
-    elif mt in (MoveType.PROMOTION, MoveType.PROMOTION_CAPTURE):
-        promoted_piece = make_piece(board.turn, move.promotion)
-
-        if move.unklik_index == -1:
-            # Combined promotion: pawn promotes, companion piece comes along
-            companion = None
-            for p in squares[from_sq].pieces:
-                if piece_type(p) != PieceType.PAWN:
-                    companion = p
-                    break
-            squares[from_sq].clear()
-            squares[to_sq].clear()
-            if companion:
-                squares[to_sq].pieces = [companion, promoted_piece]
-            else:
-                squares[to_sq].pieces = [promoted_piece]
-        elif move.unklik_index > 0 or len(squares[from_sq].pieces) >= 2:
-            # Unklik promotion: one piece leaves stack to promote
-            squares[from_sq].remove_at(move.unklik_index)
-            squares[to_sq].clear()
-            squares[to_sq].pieces = [promoted_piece]
-        else:
-            # Simple single-piece promotion
-            squares[from_sq].clear()
-            squares[to_sq].clear()
-            squares[to_sq].pieces = [promoted_piece]
-
     else:
-        # Normal move or capture
-        moving_pieces = squares[from_sq].pieces[:]
-        squares[from_sq].clear()
-        squares[to_sq].clear()
+        # En passant
+        captured_sq = to_sq + (-8 if board.turn == _WHITE else 8)
+        undo.modified += ((captured_sq, squares[captured_sq].pieces),)
 
-        for piece in moving_pieces:
-            squares[to_sq].pieces.append(piece)
-            if piece_type(piece) == PieceType.KING:
-                board.king_sq[board.turn] = to_sq
+        squares[from_sq].pieces = []
+        squares[captured_sq].pieces = []
+        squares[to_sq].pieces = from_pieces[:]
 
-    # Update castling rights
-    if from_sq == Square.E1 or to_sq == Square.E1:
-        board.castling &= ~CastlingRights.WHITE
-    if from_sq == Square.E8 or to_sq == Square.E8:
-        board.castling &= ~CastlingRights.BLACK
-    if from_sq == Square.A1 or to_sq == Square.A1:
-        board.castling &= ~CastlingRights.W_QUEENSIDE
-    if from_sq == Square.H1 or to_sq == Square.H1:
-        board.castling &= ~CastlingRights.W_KINGSIDE
-    if from_sq == Square.A8 or to_sq == Square.A8:
-        board.castling &= ~CastlingRights.B_QUEENSIDE
-    if from_sq == Square.H8 or to_sq == Square.H8:
-        board.castling &= ~CastlingRights.B_KINGSIDE
+    # Update castling rights (a king or rook square touched loses its rights)
+    if board.castling:
+        board.castling &= _CASTLE_KEEP[from_sq] & _CASTLE_KEEP[to_sq]
 
     # Update halfmove clock
-    is_capture = mt in (MoveType.CAPTURE, MoveType.EN_PASSANT, MoveType.PROMOTION_CAPTURE)
-    if moving_piece_type == PieceType.PAWN or is_capture:
+    is_capture = mt in _CAPTURE_TYPES
+    if moving_piece_type == _PAWN or is_capture:
         board.halfmove_clock = 0
     else:
         board.halfmove_clock += 1
 
     # Update en passant square
     board.ep_square = None
-    if moving_piece_type == PieceType.PAWN:
+    if moving_piece_type == _PAWN:
         if abs((to_sq >> 3) - (from_sq >> 3)) == 2:
             board.ep_square = (from_sq + to_sq) // 2
 
@@ -816,47 +1164,80 @@ def make_move(board: Board, move: Move) -> UndoInfo:
     color_moved = board.turn
     from_rank = from_sq >> 3
     from_file = from_sq & 7
-    if moving_piece_type == PieceType.PAWN:
-        if color_moved == Color.WHITE and from_rank == 1:
-            board.unmoved_pawns[Color.WHITE] &= ~(1 << from_file)
-        elif color_moved == Color.BLACK and from_rank == 6:
-            board.unmoved_pawns[Color.BLACK] &= ~(1 << from_file)
-    # For combined moves with a stack that had a pawn
-    elif mt in (MoveType.NORMAL, MoveType.CAPTURE, MoveType.KLIK):
-        if color_moved == Color.WHITE and from_rank == 1:
-            board.unmoved_pawns[Color.WHITE] &= ~(1 << from_file)
-        elif color_moved == Color.BLACK and from_rank == 6:
-            board.unmoved_pawns[Color.BLACK] &= ~(1 << from_file)
+    # (also for combined moves with a stack that had a pawn)
+    if moving_piece_type == _PAWN or mt in _WHOLE_STACK_TYPES:
+        if from_rank == (1 if color_moved == _WHITE else 6):
+            board.unmoved_pawns[color_moved] &= ~(1 << from_file)
 
     # Switch turn
-    board.turn = board.turn.opposite()
-    if board.turn == Color.WHITE:
+    board.turn = OPPOSITE_COLOR[board.turn]
+    if board.turn == _WHITE:
         board.fullmove += 1
 
     # Incremental Zobrist hash update
-    zob = _get_zobrist()
     h = undo.zobrist_hash
-    pk = zob.piece_keys
-
-    # XOR out old pieces on modified squares, XOR in new pieces
+    pk = ZOBRIST_PIECE
+
+    # XOR out old pieces on modified squares, XOR in new pieces,
+    # and move the same pieces between bitboards
+    bb = board.bb
+    bottom = board.bottom
+    occ = board.occ
+    occupied = board.occupied
+    stack_bb = board.stack_bb
+    counts = board.piece_counts
+    psqt = board.psqt
     for msq, old_pieces in undo.modified:
-        for i in range(len(old_pieces)):
-            h ^= pk[old_pieces[i]][i][msq]
+        bit = 1 << msq
+        mask = ~bit
+        n = len(old_pieces)
+        if n:
+            for i in range(n):
+                p = old_pieces[i]
+                h ^= pk[p][i][msq]
+                counts[p] -= 1
+                psqt -= PIECE_SQUARE_SCORE[p][msq]
+            p = old_pieces[-1]
+            bb[p >> 3][p & 7] &= mask
+            if n == 2:
+                p = old_pieces[0]
+                bottom[p >> 3][p & 7] &= mask
+            occ[0] &= mask
+            occ[1] &= mask
+            occupied &= mask
+            stack_bb &= mask
         new_pieces = squares[msq].pieces
-        for i in range(len(new_pieces)):
-            h ^= pk[new_pieces[i]][i][msq]
+        n = len(new_pieces)
+        if n:
+            for i in range(n):
+                p = new_pieces[i]
+                h ^= pk[p][i][msq]
+                counts[p] += 1
+                psqt += PIECE_SQUARE_SCORE[p][msq]
+            p = new_pieces[-1]
+            bb[p >> 3][p & 7] |= bit
+            occ[p >> 3] |= bit
+            if n == 2:
+                p = new_pieces[0]
+                bottom[p >> 3][p & 7] |= bit
+                occ[p >> 3] |= bit
+                stack_bb |= bit
+            occupied |= bit
+    board.occupied = occupied
+    board.stack_bb = stack_bb
+    board.psqt = psqt
 
     # Update castling hash (XOR is self-inverse, so XOR old then new)
-    h ^= zob.castling_keys[undo.castling] ^ zob.castling_keys[board.castling]
+    h ^= ZOBRIST_CASTLING[undo.castling] ^ ZOBRIST_CASTLING[board.castling]
 
     # Update en passant hash
     if undo.ep_square is not None:
-        h ^= zob.ep_keys[undo.ep_square & 7]
+        h ^= ZOBRIST_EP[undo.ep_square & 7]
     if board.ep_square is not None:
-        h ^= zob.ep_keys[board.ep_square & 7]
+        h ^= ZOBRIST_EP[board.ep_square & 7]
 
     # Toggle turn
-    h ^= zob.turn_key
+    h ^= ZOBRIST_TURN
 
     board.zobrist_hash = h
 
@@ -865,9 +1246,47 @@ def make_move(board: Board, move: Move) -> UndoInfo:
 
 def unmake_move(board: Board, move: Move, undo: UndoInfo):
     """Unmake a move, restoring the board to its previous state."""
-    # Restore modified squares
+    # Restore modified squares, their bitboard bits and piece counts
+    squares = board.squares
+    bb = board.bb
+    bottom = board.bottom
+    occ = board.occ
+    occupied = board.occupied
+    stack_bb = board.stack_bb
+    counts = board.piece_counts
     for sq, pieces in undo.modified:
-        board.squares[sq].pieces = pieces
+        bit = 1 << sq
+        mask = ~bit
+        cur = squares[sq].pieces
+        n = len(cur)
+        if n:
+            for p in cur:
+                counts[p] -= 1
+            p = cur[-1]
+            bb[p >> 3][p & 7] &= mask
+            if n == 2:
+                p = cur[0]
+                bottom[p >> 3][p & 7] &= mask
+            occ[0] &= mask
+            occ[1] &= mask
+            occupied &= mask
+            stack_bb &= mask
+        n = len(pieces)
+        if n:
+            for p in pieces:
+                counts[p] += 1
+            p = pieces[-1]
+            bb[p >> 3][p & 7] |= bit
+            occ[p >> 3] |= bit
+            if n == 2:
+                p = pieces[0]
+                bottom[p >> 3][p & 7] |= bit
+                occ[p >> 3] |= bit
+                stack_bb |= bit
+            occupied |= bit
+        squares[sq].pieces = pieces
+    board.occupied = occupied
+    board.stack_bb = stack_bb
 
     # Restore board state
     board.castling = undo.castling
@@ -879,4 +1298,31 @@ def unmake_move(board: Board, move: Move, undo: UndoInfo):
     board.unmoved_pawns[0] = undo.unmoved_pawns_w
     board.unmoved_pawns[1] = undo.unmoved_pawns_b
     board.zobrist_hash = undo.zobrist_hash
-    board.turn = board.turn.opposite()
+    board.psqt = undo.psqt
+    board.turn = OPPOSITE_COLOR[board.turn]
+
+
+def make_null_move(board: Board) -> Optional[int]:
+    """
+    Pass the turn (for null-move pruning): flip the side to move and clear
+    the en passant square. Returns the old en passant square for
+    unmake_null_move.
+    """
+    ep_square = board.ep_square
+    h = board.zobrist_hash ^ ZOBRIST_TURN
+    if ep_square is not None:
+        h ^= ZOBRIST_EP[ep_square & 7]
+        board.ep_square = None
+    board.zobrist_hash = h
+    board.turn = OPPOSITE_COLOR[board.turn]
+    return ep_square
+
+
+def unmake_null_move(board: Board, ep_square: Optional[int]):
+    """Undo make_null_move, given the en passant square it returned."""
+    h = board.zobrist_hash ^ ZOBRIST_TURN
+    if ep_square is not None:
+        h ^= ZOBRIST_EP[ep_square & 7]
+        board.ep_square = ep_square
+    board.zobrist_hash = h
+    board.turn = OPPOSITE_COLOR[board.turn]
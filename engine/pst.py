@@ -0,0 +1,144 @@
+"""
+Klikschaak Engine - Piece-Square Tables
+Shared by evaluate (king tables, passed pawns) and Board (running material +
+PST score), so kept free of any board/movegen imports.
+"""
+from .types import PieceType, PIECE_VALUES_BY_PIECE
+
+# Piece-square tables (from White's perspective)
+# Values are centipawns (1/100 of a pawn). Tuples: fixed, and indexed as fast
+# as lists (array('h') would box a new int on every read).
+
+PAWN_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+
+ROOK_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+)
+
+QUEEN_TABLE = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+
+KING_MIDDLEGAME_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+
+KING_ENDGAME_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+PST = {
+    PieceType.PAWN: PAWN_TABLE,
+    PieceType.KNIGHT: KNIGHT_TABLE,
+    PieceType.BISHOP: BISHOP_TABLE,
+    PieceType.ROOK: ROOK_TABLE,
+    PieceType.QUEEN: QUEEN_TABLE,
+    PieceType.KING: KING_MIDDLEGAME_TABLE,
+}
+
+
+# MIRROR[sq]: the same square seen from Black's side (rank flipped)
+MIRROR = tuple(sq ^ 56 for sq in range(64))
+
+
+def mirror_square(sq: int) -> int:
+    """Mirror square for black's perspective"""
+    return MIRROR[sq]
+
+
+# King tables pre-flipped for Black, indexed by the real square
+KING_MIDDLEGAME_TABLE_B = tuple(KING_MIDDLEGAME_TABLE[MIRROR[sq]] for sq in range(64))
+KING_ENDGAME_TABLE_B = tuple(KING_ENDGAME_TABLE[MIRROR[sq]] for sq in range(64))
+
+# KING_ENDGAME_DELTA[color][sq]: White-relative score change when a king of
+# that color on sq switches from the middlegame to the endgame table (black
+# row pre-mirrored and negated)
+KING_ENDGAME_DELTA = (
+    tuple(KING_ENDGAME_TABLE[sq] - KING_MIDDLEGAME_TABLE[sq] for sq in range(64)),
+    tuple(KING_MIDDLEGAME_TABLE_B[sq] - KING_ENDGAME_TABLE_B[sq] for sq in range(64)),
+)
+
+
+# Signed material per raw piece code (0 for empty / unused codes)
+MATERIAL_FOLDED = tuple(
+    PIECE_VALUES_BY_PIECE[p] * (1 if p < 8 else -1) for p in range(15))
+
+
+def _piece_square_row(p: int) -> tuple:
+    """Signed material + PST of piece code p on each square"""
+    pt = p & 7
+    if pt not in PST:
+        return (MATERIAL_FOLDED[p],) * 64
+    table = PST[pt]
+    if p < 8:
+        return tuple(MATERIAL_FOLDED[p] + table[sq] for sq in range(64))
+    return tuple(MATERIAL_FOLDED[p] - table[MIRROR[sq]] for sq in range(64))
+
+
+# PIECE_SQUARE_SCORE[piece][sq]: material + PST of that piece on that square
+# as a White-relative signed score, black rows pre-mirrored. Empty codes are
+# all zeros. Stored as a tuple of per-piece tuples: CPython specializes
+# tuple-by-int subscripts, so [piece][sq] reads faster than one flat table
+# with a computed index or an array('h') row. Kings use the middlegame
+# table; evaluate adds KING_ENDGAME_DELTA on top once the position is an
+# endgame.
+PIECE_SQUARE_SCORE = tuple(_piece_square_row(p) for p in range(15))
@@ -2,25 +2,41 @@
 Klikschaak Engine - Alpha-Beta Search
 """
 import time
-import random
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Sequence
 from dataclasses import dataclass
-from .types import Color, Move, MoveType, PieceType, piece_type, piece_color, PIECE_VALUES
+from .types import Color, Move, MoveType, PieceType, piece_color, PIECE_VALUES_BY_PIECE
 from .board import Board
-from .movegen import generate_moves, make_move, unmake_move, is_in_check
+from .movegen import (
+    generate_moves, make_move, unmake_move, is_in_check,
+    make_null_move, unmake_null_move
+)
 from .evaluate import evaluate, CHECKMATE_SCORE, DRAW_SCORE
+# ZobristKeys is unused here but kept as a deliberate re-export of the public API.
+from .zobrist import ZobristKeys, ZOBRIST
 
 # Search constants
 MAX_DEPTH = 64
 INFINITY = 1000000
 
+# Shared empty PV for nodes that don't report one (callers never mutate PVs)
+_NO_PV: Tuple[Move, ...] = ()
+
 # Capture move types for fast checking
 _CAPTURE_TYPES = frozenset({
     MoveType.CAPTURE, MoveType.EN_PASSANT, MoveType.PROMOTION_CAPTURE
 })
+# The one generated move type that may or may not capture (enum member
+# lookups are slow, so it is bound once)
+_UNKLIK = MoveType.UNKLIK
+_BLACK = Color.BLACK
+_KNIGHT, _BISHOP, _ROOK, _QUEEN = (int(PieceType.KNIGHT), int(PieceType.BISHOP),
+                                   int(PieceType.ROOK), int(PieceType.QUEEN))
+
+# Material value indexed by raw piece code (colour bit included)
+_PIECE_VALUE = PIECE_VALUES_BY_PIECE
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchInfo:
     """Information about the search"""
     nodes: int = 0
@@ -35,55 +51,34 @@ class SearchInfo:
             self.pv = []
 
 
-class TranspositionEntry:
-    """Entry in transposition table"""
-    __slots__ = ['key', 'depth', 'score', 'flag', 'best_move']
-    EXACT = 0
-    ALPHA = 1  # Upper bound
-    BETA = 2   # Lower bound
-
-    def __init__(self, key: int, depth: int, score: int, flag: int, best_move: Optional[Move]):
-        self.key = key
-        self.depth = depth
-        self.score = score
-        self.flag = flag
-        self.best_move = best_move
-
-
-# Zobrist hashing
-class ZobristKeys:
-    """Pre-computed random keys for Zobrist hashing."""
-
-    def __init__(self, seed: int = 42):
-        rng = random.Random(seed)
-
-        # piece_keys[piece_value][stack_index][square]
-        # piece values: 0-14, stack_index: 0-1, square: 0-63
-        self.piece_keys = [[[rng.getrandbits(64) for _ in range(64)]
-                            for _ in range(2)]
-                           for _ in range(15)]
-
-        self.turn_key = rng.getrandbits(64)
-
-        # Castling keys for each of the 16 possible states
-        self.castling_keys = [rng.getrandbits(64) for _ in range(16)]
+# Transposition table: TT_SIZE slots (a power of two) indexed by
+# key & (TT_SIZE - 1), stored as parallel lists rather than entry objects
+TT_SIZE = 1 << 18
 
-        # En passant file keys
-        self.ep_keys = [rng.getrandbits(64) for _ in range(8)]  # 8 files
-
-
-ZOBRIST = ZobristKeys()
+# Transposition table entry flags
+TT_EXACT = 0
+TT_ALPHA = 1  # Upper bound
+TT_BETA = 2   # Lower bound
 
 
 def compute_zobrist(board: Board) -> int:
-    """Compute full Zobrist hash for a position."""
+    """
+    Compute full Zobrist hash for a position from scratch.
+    Board keeps zobrist_hash up to date itself; this re-syncs it after
+    direct field edits (e.g. board.turn set by hand).
+    """
     h = 0
     piece_keys = ZOBRIST.piece_keys
+    squares = board.squares
 
-    for sq in range(64):
-        pieces = board.squares[sq].pieces
-        for i, piece in enumerate(pieces):
-            h ^= piece_keys[int(piece)][i][sq]
+    # Occupied squares only
+    bb = board.occupied
+    while bb:
+        lsb = bb & -bb
+        sq = lsb.bit_length() - 1
+        bb ^= lsb
+        for i, piece in enumerate(squares[sq].pieces):
+            h ^= piece_keys[piece][i][sq]
 
     if board.turn == Color.BLACK:
         h ^= ZOBRIST.turn_key
@@ -108,15 +103,17 @@ class SearchEngine:
     # Aspiration window size
     ASPIRATION_WINDOW = 50
 
+    # Null-move pruning depth reduction
+    NULL_MOVE_R = 2
+
     def __init__(self):
         self.nodes = 0
-        self.start_time = 0
-        self.max_time_ms = 0
+        self.start_ns = 0
+        self.deadline_ns = 0
         self.stop_search = False
 
-        # Transposition table
-        self.tt: dict[int, TranspositionEntry] = {}
-        self.tt_size = 1000000
+        # Transposition table (always-replace)
+        self._init_tt()
 
         # Killer moves (moves that caused beta cutoffs)
         self.killers: List[List[Optional[Move]]] = [[None, None] for _ in range(MAX_DEPTH)]
@@ -130,18 +127,27 @@ class SearchEngine:
         # Previous move (for countermove heuristic)
         self.prev_move: Optional[Move] = None
 
+    def _init_tt(self):
+        """Allocate an empty transposition table"""
+        self.tt_mask = TT_SIZE - 1
+        self.tt_keys: List[Optional[int]] = [None] * TT_SIZE
+        self.tt_depth: List[int] = [0] * TT_SIZE
+        self.tt_score: List[int] = [0] * TT_SIZE
+        self.tt_flag: List[int] = [0] * TT_SIZE
+        self.tt_move: List[Optional[Move]] = [None] * TT_SIZE
+
     def clear(self):
         """Clear search state"""
-        self.tt.clear()
+        # Only the keys need resetting: every probe checks the key first, so
+        # stale depth/score/flag/move slots are unreachable until overwritten
+        self.tt_keys = [None] * TT_SIZE
         self.killers = [[None, None] for _ in range(MAX_DEPTH)]
         self.history = [[0] * 64 for _ in range(64)]
         self.countermove = [[None] * 64 for _ in range(64)]
 
     def _decay_history(self):
         """Decay history scores by half each ID iteration"""
-        for i in range(64):
-            for j in range(64):
-                self.history[i][j] >>= 1
+        self.history = [[h >> 1 for h in row] for row in self.history]
 
     def search(self, board: Board, depth: int = 6,
                time_limit_ms: int = None) -> Tuple[Move, SearchInfo]:
@@ -149,8 +155,11 @@ class SearchEngine:
         Search for the best move using iterative deepening with aspiration windows.
         """
         self.nodes = 0
-        self.start_time = time.time() * 1000
-        self.max_time_ms = time_limit_ms or float('inf')
+        # Time limit as a monotonic deadline in ns, so the node-count
+        # throttle in alpha_beta only does an int comparison
+        self.start_ns = time.monotonic_ns()
+        self.deadline_ns = (self.start_ns + time_limit_ms * 1_000_000
+                            if time_limit_ms else float('inf'))
         self.stop_search = False
 
         # Initialize Zobrist hash once
@@ -170,30 +179,30 @@ class SearchEngine:
 
             # Aspiration windows after depth 1
             if d <= 1:
-                score, pv = self.alpha_beta(board, d, -INFINITY, INFINITY, [], None)
+                score, pv = self.alpha_beta(board, d, -INFINITY, INFINITY, None)
             else:
                 window = self.ASPIRATION_WINDOW
                 alpha_w = prev_score - window
                 beta_w = prev_score + window
 
-                score, pv = self.alpha_beta(board, d, alpha_w, beta_w, [], None)
+                score, pv = self.alpha_beta(board, d, alpha_w, beta_w, None)
 
                 if not self.stop_search:
                     # Fail-low or fail-high: re-search with full window
                     if score <= alpha_w or score >= beta_w:
-                        score, pv = self.alpha_beta(board, d, -INFINITY, INFINITY, [], None)
+                        score, pv = self.alpha_beta(board, d, -INFINITY, INFINITY, None)
 
             if not self.stop_search:
                 prev_score = score
                 info.depth = d
                 info.score = score if board.turn == Color.WHITE else -score
-                info.pv = pv[:]
+                info.pv = list(pv)
                 info.nodes = self.nodes
 
                 if pv:
                     best_move = pv[0]
 
-                elapsed = time.time() * 1000 - self.start_time
+                elapsed = (time.monotonic_ns() - self.start_ns) / 1_000_000
                 info.time_ms = int(elapsed)
                 info.nps = int(self.nodes / (elapsed / 1000)) if elapsed > 0 else 0
 
@@ -208,52 +217,78 @@ class SearchEngine:
         return best_move, info
 
     def alpha_beta(self, board: Board, depth: int, alpha: int, beta: int,
-                   pv: List[Move], prev_move: Optional[Move]) -> Tuple[int, List[Move]]:
+                   prev_move: Optional[Move],
+                   in_check: Optional[bool] = None,
+                   allow_null: bool = True) -> Tuple[int, Sequence[Move]]:
         """
         Alpha-beta search with PV tracking, LMR, and futility pruning.
+        in_check: whether the side to move is in check, if the caller knows.
+        Below the root (prev_move set) the move into this node was already
+        checked for legality, so the side that just moved is not in check.
+        Only nodes with an open window build a PV; null-window nodes return
+        _NO_PV.
+        allow_null: False for the reply to a null move, so two passes can't
+        follow each other.
         """
         self.nodes += 1
 
         # Time check
         if self.nodes % 4096 == 0:
-            elapsed = time.time() * 1000 - self.start_time
-            if elapsed >= self.max_time_ms:
+            if time.monotonic_ns() >= self.deadline_ns:
                 self.stop_search = True
-                return 0, []
+                return 0, _NO_PV
 
         if self.stop_search:
-            return 0, []
+            return 0, _NO_PV
 
         # Leaf node - evaluate via quiescence
         if depth <= 0:
-            score = self.quiescence(board, alpha, beta)
-            return score, []
+            score = self.quiescence(board, alpha, beta, 0, in_check)
+            return score, _NO_PV
 
         # TT lookup
         tt_key = board.zobrist_hash
-        tt_entry = self.tt.get(tt_key)
+        tt_idx = tt_key & self.tt_mask
         tt_move = None
 
-        if tt_entry and tt_entry.key == tt_key:
-            if tt_entry.depth >= depth:
-                if tt_entry.flag == TranspositionEntry.EXACT:
-                    return tt_entry.score, [tt_entry.best_move] if tt_entry.best_move else []
-                elif tt_entry.flag == TranspositionEntry.ALPHA:
-                    if tt_entry.score <= alpha:
-                        return alpha, []
-                elif tt_entry.flag == TranspositionEntry.BETA:
-                    if tt_entry.score >= beta:
-                        return beta, []
-            tt_move = tt_entry.best_move
-
-        in_check = is_in_check(board, board.turn)
+        if self.tt_keys[tt_idx] == tt_key:
+            tt_move = self.tt_move[tt_idx]
+            if self.tt_depth[tt_idx] >= depth:
+                tt_flag = self.tt_flag[tt_idx]
+                tt_score = self.tt_score[tt_idx]
+                if tt_flag == TT_EXACT:
+                    return tt_score, (tt_move,) if tt_move else _NO_PV
+                elif tt_flag == TT_ALPHA:
+                    if tt_score <= alpha:
+                        return alpha, _NO_PV
+                elif tt_flag == TT_BETA:
+                    if tt_score >= beta:
+                        return beta, _NO_PV
+
+        if in_check is None:
+            in_check = is_in_check(board, board.turn)
+
+        # Null-move pruning: if passing the turn still fails high at reduced
+        # depth, some real move will too. Only at null-window nodes, and not
+        # when the side to move has only pawns left (zugzwang).
+        if (allow_null and not in_check and depth >= 3 and beta - alpha == 1 and
+                beta < CHECKMATE_SCORE - MAX_DEPTH and _has_non_pawn_material(board)):
+            ep_square = make_null_move(board)
+            # The opponent's king can't be attacked: they moved into this node
+            score, _ = self.alpha_beta(board, depth - 1 - self.NULL_MOVE_R,
+                                       -beta, -beta + 1, None, False, False)
+            unmake_null_move(board, ep_square)
+            if self.stop_search:
+                return 0, _NO_PV
+            if -score >= beta:
+                return beta, _NO_PV
 
         # Futility pruning: at shallow depths, if static eval + margin < alpha,
         # skip quiet moves (captures are still searched)
         futile = False
         if not in_check and depth <= 2:
-            static_eval = evaluate(board)
-            if board.turn == Color.BLACK:
+            static_eval = evaluate(board, False, False if prev_move is not None else None)
+            if board.turn == _BLACK:
                 static_eval = -static_eval
             if static_eval + self.FUTILITY_MARGINS[depth] <= alpha:
                 futile = True
@@ -263,21 +298,24 @@ class SearchEngine:
 
         if not moves:
             if in_check:
-                return -CHECKMATE_SCORE + (MAX_DEPTH - depth), []
+                return -CHECKMATE_SCORE + (MAX_DEPTH - depth), _NO_PV
             else:
-                return DRAW_SCORE, []
+                return DRAW_SCORE, _NO_PV
 
         # Move ordering
         moves = self.order_moves(board, moves, depth, tt_move, prev_move)
 
         original_alpha = alpha
+        want_pv = beta - alpha > 1
         best_score = -INFINITY
         best_move = None
-        best_pv = []
+        best_pv = _NO_PV
         legal_count = 0
 
+        squares = board.squares
+        turn = board.turn
         for move in moves:
-            is_cap = self.is_capture(board, move)
+            is_cap = _is_capture(move, squares, turn)
 
             # Futility pruning: skip quiet moves at shallow depths
             if futile and not is_cap and not in_check:
@@ -289,7 +327,7 @@ class SearchEngine:
             undo = make_move(board, move)
 
             # Skip illegal moves (king left in check)
-            if is_in_check(board, board.turn.opposite()):
+            if is_in_check(board, board.turn ^ 1):
                 unmake_move(board, move, undo)
                 continue
 
@@ -300,7 +338,7 @@ class SearchEngine:
             if legal_count == 1:
                 # Full window search for first legal move
                 score, child_pv = self.alpha_beta(board, depth - 1,
-                                                   -beta, -alpha, [], move)
+                                                   -beta, -alpha, move, gives_check)
                 score = -score
             else:
                 # Late Move Reductions: reduce depth for late quiet moves
@@ -311,33 +349,34 @@ class SearchEngine:
 
                 # Null window search (possibly with reduction)
                 score, _ = self.alpha_beta(board, depth - 1 - reduction,
-                                           -alpha - 1, -alpha, [], move)
+                                           -alpha - 1, -alpha, move, gives_check)
                 score = -score
 
                 # Re-search at full depth if reduced search improved alpha
                 if reduction > 0 and score > alpha:
                     score, _ = self.alpha_beta(board, depth - 1,
-                                               -alpha - 1, -alpha, [], move)
+                                               -alpha - 1, -alpha, move, gives_check)
                     score = -score
 
                 # Re-search with full window if necessary
                 if alpha < score < beta:
                     score, child_pv = self.alpha_beta(board, depth - 1,
-                                                       -beta, -score, [], move)
+                                                       -beta, -score, move, gives_check)
                     score = -score
                 else:
-                    child_pv = []
+                    child_pv = _NO_PV
 
             # Unmake
             unmake_move(board, move, undo)
 
             if self.stop_search:
-                return 0, []
+                return 0, _NO_PV
 
             if score > best_score:
                 best_score = score
                 best_move = move
-                best_pv = [move] + child_pv
+                if want_pv:
+                    best_pv = [move, *child_pv]
 
             if score > alpha:
                 alpha = score
@@ -345,9 +384,10 @@ class SearchEngine:
             if alpha >= beta:
                 # Beta cutoff - update killers, history, and countermove
                 if not is_cap:
-                    if move not in self.killers[depth]:
-                        self.killers[depth][1] = self.killers[depth][0]
-                        self.killers[depth][0] = move
+                    killers = self.killers[depth]
+                    if move != killers[0] and move != killers[1]:
+                        killers[1] = killers[0]
+                        killers[0] = move
                     self.history[move.from_sq][move.to_sq] += depth * depth
                     if prev_move is not None:
                         self.countermove[prev_move.from_sq][prev_move.to_sq] = move
@@ -356,32 +396,38 @@ class SearchEngine:
         # No legal moves found
         if legal_count == 0:
             if in_check:
-                return -CHECKMATE_SCORE + (MAX_DEPTH - depth), []
+                return -CHECKMATE_SCORE + (MAX_DEPTH - depth), _NO_PV
             else:
-                return DRAW_SCORE, []
+                return DRAW_SCORE, _NO_PV
 
         # Store in TT
-        flag = TranspositionEntry.EXACT
+        flag = TT_EXACT
         if best_score <= original_alpha:
-            flag = TranspositionEntry.ALPHA
+            flag = TT_ALPHA
         elif best_score >= beta:
-            flag = TranspositionEntry.BETA
+            flag = TT_BETA
 
-        if len(self.tt) < self.tt_size:
-            self.tt[tt_key] = TranspositionEntry(tt_key, depth, best_score, flag, best_move)
+        self.tt_keys[tt_idx] = tt_key
+        self.tt_depth[tt_idx] = depth
+        self.tt_score[tt_idx] = best_score
+        self.tt_flag[tt_idx] = flag
+        self.tt_move[tt_idx] = best_move
 
         return best_score, best_pv
 
-    def quiescence(self, board: Board, alpha: int, beta: int, qdepth: int = 0) -> int:
+    def quiescence(self, board: Board, alpha: int, beta: int, qdepth: int = 0,
+                   in_check: Optional[bool] = None) -> int:
         """
         Quiescence search - only search captures to avoid horizon effect.
         Uses captures-only move generation and make/unmake.
+        Only entered after a legal move, so the side that just moved is never
+        in check here; in_check is the side to move's, if the caller knows.
         """
         self.nodes += 1
 
         # Stand pat
-        stand_pat = evaluate(board)
-        if board.turn == Color.BLACK:
+        stand_pat = evaluate(board, in_check, False)
+        if board.turn == _BLACK:
             stand_pat = -stand_pat
 
         if stand_pat >= beta:
@@ -399,13 +445,17 @@ class SearchEngine:
 
         # Order captures by MVV-LVA
         if captures:
-            captures.sort(key=lambda m: self.mvv_lva_score(board, m), reverse=True)
+            squares = board.squares
+            turn = board.turn
+            scores = [_mvv_lva(m, squares, turn) for m in captures]
+            captures = [captures[i] for i in
+                        sorted(range(len(captures)), key=scores.__getitem__, reverse=True)]
 
         for move in captures:
             undo = make_move(board, move)
 
             # Skip illegal moves
-            if is_in_check(board, board.turn.opposite()):
+            if is_in_check(board, board.turn ^ 1):
                 unmake_move(board, move, undo)
                 continue
 
@@ -434,61 +484,113 @@ class SearchEngine:
 
     def mvv_lva_score(self, board: Board, move: Move) -> int:
         """Most Valuable Victim - Least Valuable Attacker score."""
-        # Victim value
-        target_pieces = board.squares[move.to_sq].pieces
-        if not target_pieces:
-            victim_value = 100  # en passant
-        else:
-            victim_value = sum(PIECE_VALUES[piece_type(p)] for p in target_pieces
-                               if piece_color(p) != board.turn)
-
-        # Attacker value
-        from_pieces = board.squares[move.from_sq].pieces
-        if move.unklik_index is not None and 0 <= move.unklik_index < len(from_pieces):
-            attacker = from_pieces[move.unklik_index]
-        else:
-            attacker = from_pieces[-1] if from_pieces else None
-
-        attacker_value = PIECE_VALUES[piece_type(attacker)] if attacker else 0
-
-        return victim_value * 10 - attacker_value
+        return _mvv_lva(move, board.squares, board.turn)
 
     def order_moves(self, board: Board, moves: List[Move], depth: int,
                     tt_move: Optional[Move],
                     prev_move: Optional[Move] = None) -> List[Move]:
         """Order moves for better pruning"""
-        scored_moves = []
+        scores = []
 
         # Get countermove for previous opponent move
         cm = None
         if prev_move is not None:
             cm = self.countermove[prev_move.from_sq][prev_move.to_sq]
 
+        squares = board.squares
+        turn = board.turn
+        killer1, killer2 = self.killers[depth] if depth < MAX_DEPTH else (None, None)
+        history = self.history
+
+        # Compare packed move codes rather than going through Move.__eq__
+        # (-1 never matches a move)
+        tt_packed = tt_move.packed if tt_move else -1
+        killer1 = killer1.packed if killer1 is not None else -1
+        killer2 = killer2.packed if killer2 is not None else -1
+        cm = cm.packed if cm is not None else -1
+
         for move in moves:
-            score = 0
+            packed = move.packed
 
             # TT move first
-            if tt_move and move == tt_move:
-                score = 10000000
-            # Captures by MVV-LVA
-            elif self.is_capture(board, move):
-                score = 1000000 + self.mvv_lva_score(board, move)
+            if packed == tt_packed:
+                scores.append(10000000)
+                continue
+
+            # Captures by MVV-LVA (_is_capture() inlined)
+            move_type = move.move_type
+            if move_type in _CAPTURE_TYPES:
+                is_cap = True
+            elif move_type == _UNKLIK:
+                target_pieces = squares[move.to_sq].pieces
+                is_cap = bool(target_pieces) and (target_pieces[-1] >> 3) != turn
+            else:
+                is_cap = False
+
+            if is_cap:
+                score = 1000000 + _mvv_lva(move, squares, turn)
             # Killers
-            elif depth < MAX_DEPTH and move == self.killers[depth][0]:
+            elif packed == killer1:
                 score = 900000
-            elif depth < MAX_DEPTH and move == self.killers[depth][1]:
+            elif packed == killer2:
                 score = 800000
             # Countermove
-            elif cm is not None and move == cm:
+            elif packed == cm:
                 score = 700000
             # History heuristic
             else:
-                score = self.history[move.from_sq][move.to_sq]
+                score = history[move.from_sq][move.to_sq]
+
+            scores.append(score)
+
+        # Stable sort of indices by score, so equal scores keep generation order
+        return [moves[i] for i in sorted(range(len(moves)), key=scores.__getitem__, reverse=True)]
 
-            scored_moves.append((score, move))
 
-        scored_moves.sort(key=lambda x: x[0], reverse=True)
-        return [m for _, m in scored_moves]
+def _has_non_pawn_material(board: Board) -> bool:
+    """Whether the side to move has a knight, bishop, rook or queen"""
+    counts = board.piece_counts
+    base = board.turn << 3
+    return bool(counts[base | _KNIGHT] or counts[base | _BISHOP] or
+                counts[base | _ROOK] or counts[base | _QUEEN])
+
+
+def _is_capture(move: Move, squares: list, turn: Color) -> bool:
+    """
+    is_capture() for generated moves. Their type already tells captures
+    apart, except UNKLIK, which is used both onto empty and enemy squares.
+    """
+    move_type = move.move_type
+    if move_type in _CAPTURE_TYPES:
+        return True
+    if move_type == _UNKLIK:
+        target_pieces = squares[move.to_sq].pieces
+        return bool(target_pieces) and (target_pieces[-1] >> 3) != turn
+    return False
+
+
+def _mvv_lva(move: Move, squares: list, turn: Color) -> int:
+    """SearchEngine.mvv_lva_score() on the board's squares and side to move"""
+    # Victim value
+    target_pieces = squares[move.to_sq].pieces
+    if not target_pieces:
+        victim_value = 100  # en passant
+    else:
+        victim_value = 0
+        for p in target_pieces:
+            if (p >> 3) != turn:
+                victim_value += _PIECE_VALUE[p]
+
+    # Attacker value
+    from_pieces = squares[move.from_sq].pieces
+    if 0 <= move.unklik_index < len(from_pieces):
+        attacker = from_pieces[move.unklik_index]
+    elif from_pieces:
+        attacker = from_pieces[-1]
+    else:
+        return victim_value * 10
+
+    return victim_value * 10 - _PIECE_VALUE[attacker]
 
 
 # Global engine instance
@@ -4,10 +4,14 @@ Tests all Klikschaak-specific rules and standard chess rules.
 """
 from .types import (
     Color, Piece, PieceType, Square, Move, MoveType, CastlingRights,
-    piece_color, piece_type, make_piece, parse_square, square_name
+    piece_color, piece_type, make_piece, square_name
 )
 from .board import Board, STARTING_FEN
-from .movegen import generate_moves, make_move, unmake_move, is_in_check, is_legal
+from .movegen import (
+    generate_moves, make_move, unmake_move, is_in_check, is_legal,
+    clear_move_cache, _generate_moves
+)
+from .evaluate import evaluate, clear_eval_cache, _evaluate
 
 passed = 0
 failed = 0
@@ -49,8 +53,20 @@ def find_moves(moves, from_sq=None, to_sq=None, move_type=None, unklik_index=Non
     return result
 
 
+# Square names to indices, parsed once at import
+_SQUARES = {square_name(s): s for s in range(64)}
+
+
 def sq(name):
-    return parse_square(name)
+    return _SQUARES[name]
+
+
+def board_snapshot(b):
+    """Every piece of board state make/unmake touches, as comparable tuples."""
+    return (tuple(tuple(s.pieces) for s in b.squares), b.turn, b.castling,
+            b.ep_square, b.halfmove_clock, b.fullmove, tuple(b.king_sq),
+            tuple(b.unmoved_pawns), tuple(map(tuple, b.bb)), tuple(map(tuple, b.bottom)),
+            tuple(b.occ), b.occupied, b.stack_bb, b.zobrist_hash)
 
 
 # =========================================================================
@@ -571,8 +587,6 @@ def test_castling_in_check():
     """Can't castle while in check."""
     print("\n--- Castling In Check ---")
     b = Board()
-    b.set_fen("r3k2r/pppp1ppp/8/4q3/8/8/PPPP1PPP/R3K2R w KQkq - 0 1")
-    # White king is not in check yet... let me use a proper position
     b.set_fen("4k3/8/8/8/4r3/8/8/R3K2R w KQ - 0 1")
     assert_true(is_in_check(b, Color.WHITE), "White in check from rook")
     moves = generate_moves(b)
@@ -798,22 +812,218 @@ def test_make_unmake_all_move_types():
         b = Board()
         b.set_fen(fen)
         original_fen = b.get_fen()
-        original_unmoved = b.unmoved_pawns[:]
+        original = board_snapshot(b)
+        original_counts = b.piece_counts[:]
+        original_psqt = b.psqt
 
         moves = generate_moves(b)
         for m in moves:
             undo = make_move(b, m)
+            counts = [0] * 15
+            for _, p in b.pieces():
+                counts[p] += 1
+            if b.piece_counts != counts:
+                assert_true(False, f"{name}: piece_counts wrong after {m.to_uci()}")
+            fresh = Board()
+            fresh.set_fen(b.get_fen())
+            if b.psqt != fresh.psqt:
+                assert_true(False, f"{name}: psqt wrong after {m.to_uci()}")
             unmake_move(b, m, undo)
-            restored_fen = b.get_fen()
-            if restored_fen != original_fen:
-                assert_true(False, f"{name}: FEN mismatch after {m.to_uci()}: "
-                           f"got {restored_fen}")
-            if b.unmoved_pawns != original_unmoved:
-                assert_true(False, f"{name}: unmoved_pawns mismatch after {m.to_uci()}")
+            if b.piece_counts != original_counts:
+                assert_true(False, f"{name}: piece_counts mismatch after {m.to_uci()}")
+            if b.psqt != original_psqt:
+                assert_true(False, f"{name}: psqt mismatch after {m.to_uci()}")
+            if board_snapshot(b) != original:
+                assert_true(False, f"{name}: state mismatch after {m.to_uci()}: "
+                           f"got {b.get_fen()}, expected {original_fen}")
 
         assert_true(True, f"{name}: all {len(moves)} moves OK")
 
 
+def test_zobrist_incremental():
+    """set_fen, mutators and make/unmake keep zobrist_hash equal to a full recompute."""
+    print("\n--- Incremental Zobrist ---")
+    from .search import compute_zobrist
+
+    fens = [
+        STARTING_FEN,
+        "r3k2r/pppppppp/8/8/8/8/PPPPPPPP/R3K2R w KQkq - 0 1",
+        "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1",
+        "4k3/8/8/8/4(NP)3/8/8/4K3 b - - 0 1",
+        "4k3/8/8/8/8/8/8/4KP1R w K - 0 1",
+    ]
+    for fen in fens:
+        b = Board()
+        b.set_fen(fen)
+        h = b.key()
+        assert_eq(h, compute_zobrist(b.copy()), f"set_fen hash: {fen}")
+
+        for m in generate_moves(b):
+            undo = make_move(b, m)
+            if b.key() != compute_zobrist(b.copy()):
+                assert_true(False, f"{fen}: hash mismatch after {m.to_uci()}")
+            unmake_move(b, m, undo)
+            if b.key() != h:
+                assert_true(False, f"{fen}: hash not restored after {m.to_uci()}")
+        assert_true(True, f"{fen}: make/unmake hashes OK")
+
+    b = Board()
+    b.set_fen("4k3/8/8/8/8/8/8/4K3 w - - 0 1")
+    b.put_piece(sq("d4"), Piece.W_PAWN)
+    b.add_to_stack(sq("d4"), Piece.W_KNIGHT)
+    b.remove_from_stack(sq("d4"), 0)
+    b.put_piece(sq("a7"), Piece.B_ROOK)
+    b.remove_piece(sq("a7"))
+    assert_eq(b.key(), compute_zobrist(b.copy()), "Mutators keep hash in sync")
+
+    # Copies share stack lists; mutating either board must not leak into the other
+    c = b.copy()
+    c.add_to_stack(sq("d4"), Piece.W_KNIGHT)
+    b.remove_from_stack(sq("d4"), 0)
+    assert_eq(c.squares[sq("d4")].pieces, [Piece.W_KNIGHT, Piece.W_KNIGHT], "Copy keeps its stack")
+    assert_eq(b.squares[sq("d4")].pieces, [], "Original unaffected by copy")
+
+
+def test_fen_cache():
+    """Memoized get_fen follows make/unmake and direct field edits."""
+    print("\n--- FEN Cache ---")
+    b = Board()
+    b.set_fen(STARTING_FEN)
+    assert_eq(b.get_fen(), STARTING_FEN, "FEN after set_fen")
+    m = find_moves(generate_moves(b), from_sq=sq("e2"), to_sq=sq("e4"))[0]
+    undo = make_move(b, m)
+    assert_eq(b.get_fen(), "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1",
+              "FEN after e2e4")
+    unmake_move(b, m, undo)
+    assert_eq(b.get_fen(), STARTING_FEN, "FEN after unmake")
+    b.turn = Color.BLACK
+    assert_true(b.get_fen().split()[1] == 'b', "FEN sees direct turn change")
+
+
+def test_eval_cache():
+    """Cached evaluate(), and evaluation with known check flags, agree with a
+    fresh evaluation across make/unmake."""
+    print("\n--- Eval Cache ---")
+    clear_eval_cache()
+    b = Board()
+    b.set_fen("r3k2(rb)/p1pp1ppp/1(nb)2p3/4P3/2(BN)5/8/PPPP1PPP/R3K2(RQ) w KQkq - 0 1")
+    start = evaluate(b)
+    assert_eq(evaluate(b), start, "Repeated evaluate")
+    for m in generate_moves(b):
+        undo = make_move(b, m)
+        if evaluate(b) != _evaluate(b):
+            assert_true(False, f"Cached eval after {m.to_uci()}")
+        flags = (is_in_check(b, b.turn), is_in_check(b, b.turn.opposite()))
+        if _evaluate(b, *flags) != _evaluate(b):
+            assert_true(False, f"Eval with known check flags after {m.to_uci()}")
+        unmake_move(b, m, undo)
+    assert_eq(evaluate(b), start, "Evaluate after unmakes")
+    clear_eval_cache()
+    assert_eq(evaluate(b), start, "Evaluate after clearing the cache")
+
+
+def test_move_cache():
+    """Cached generate_moves() matches fresh generation and hands out
+    independent lists."""
+    print("\n--- Move Cache ---")
+    clear_move_cache()
+    b = Board()
+    b.set_fen("r3k2(rb)/p1pp1ppp/1(nb)2p3/4P3/2(BN)5/8/PPPP1PPP/R3K2(RQ) w KQkq - 0 1")
+    moves = generate_moves(b)
+    moves.clear()
+    assert_eq(generate_moves(b), _generate_moves(b, b.turn, True, False),
+              "Cached list unaffected by caller edits")
+    for m in generate_moves(b):
+        undo = make_move(b, m)
+        for flags in ((True, False), (False, False), (False, True)):
+            if generate_moves(b, *flags) != _generate_moves(b, b.turn, *flags):
+                assert_true(False, f"Cached moves {flags} after {m.to_uci()}")
+        unmake_move(b, m, undo)
+
+    # Same pieces, but the d-pawn lost its double-push right
+    b.set_fen(STARTING_FEN)
+    assert_eq(len(generate_moves(b)), 34, "Start position moves")
+    b.unmoved_pawns[Color.WHITE] &= ~(1 << 3)
+    assert_eq(len(generate_moves(b)), 33, "No d2d4 without the unmoved flag")
+
+
+def test_transposition_table():
+    """Search leaves the root position in its transposition table slot."""
+    print("\n--- Transposition Table ---")
+    from .search import SearchEngine
+
+    b = Board()
+    b.set_fen("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+    searcher = SearchEngine()
+    best_move, info = searcher.search(b, 3)
+    key = b.zobrist_hash
+    idx = key & searcher.tt_mask
+    assert_eq(searcher.tt_keys[idx], key, "Root key stored")
+    assert_eq(searcher.tt_depth[idx], info.depth, "Root entry depth")
+    assert_eq(searcher.tt_move[idx], best_move, "Root entry move")
+    searcher.clear()
+    assert_eq(searcher.tt_keys[idx], None, "clear() empties the table")
+
+
+def test_null_move():
+    """A null move passes the turn, drops en passant and unmakes exactly."""
+    print("\n--- Null Move ---")
+    from .movegen import make_null_move, unmake_null_move
+    from .search import compute_zobrist
+
+    b = Board()
+    b.set_fen("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3")
+    fen, key = b.get_fen(), b.zobrist_hash
+    ep = make_null_move(b)
+    assert_eq(b.turn, Color.BLACK, "Null move passes the turn")
+    assert_eq(b.ep_square, None, "Null move clears en passant")
+    assert_eq(b.zobrist_hash, compute_zobrist(b.copy()), "Null move hash")
+    unmake_null_move(b, ep)
+    assert_eq(b.get_fen(), fen, "FEN restored after null move")
+    assert_eq(b.zobrist_hash, key, "Hash restored after null move")
+
+
+def test_api_keep_alive():
+    """Requests on one kept-alive API connection don't bleed into each other."""
+    print("\n--- API Keep-Alive ---")
+    import http.client
+    import json
+    import threading
+    from http.server import ThreadingHTTPServer
+    from . import api
+    from .api import EngineHandler
+
+    server = ThreadingHTTPServer(('localhost', 0), EngineHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        conn = http.client.HTTPConnection('localhost', server.server_address[1], timeout=10)
+        headers = {'Content-Type': 'application/json'}
+        conn.request('POST', '/nope', body='{"fen":"x"}', headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        assert_eq(resp.status, 404, "Unknown POST path")
+        conn.request('GET', '/health')
+        resp = conn.getresponse()
+        assert_eq((resp.status, resp.read()), (200, b'{"status": "ok"}'),
+                  "Next request on the same connection")
+        conn.request('POST', '/moves', body='{"fen":"%s"}' % STARTING_FEN, headers=headers)
+        resp = conn.getresponse()
+        assert_eq(json.loads(resp.read())['count'], 34, "Moves on the same connection")
+        conn.close()
+
+        # Each connection gets its own thread; engines come from the shared pool
+        for _ in range(3):
+            conn = http.client.HTTPConnection('localhost', server.server_address[1], timeout=10)
+            conn.request('POST', '/eval', body='{"fen":"%s","depth":1}' % STARTING_FEN,
+                         headers=headers)
+            assert_eq(conn.getresponse().status, 200, "Eval on a new connection")
+            conn.close()
+        assert_true(api._searchers_made <= api.SEARCH_POOL_SIZE, "Search engines bounded by the pool")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 # =========================================================================
 # 10. EDGE CASES AND INTERACTIONS
 # =========================================================================
@@ -873,6 +1083,31 @@ def test_pinned_piece():
     assert_true(len(rook_horiz) > 0,
                 "Rook CAN unklik off e-file (pawn remains blocking)")
 
+    # Pin-ray and check filters agree with playing every move out
+    for fen in ("4k3/8/1b6/8/3N4/4(NP)3/5B2/1q2K2r w - - 0 1",
+                "4k3/8/8/7b/8/5(RB)2/8/3K4 w - - 0 1",
+                "4r2k/8/8/q7/4N3/2(NP)3b1/5P2/4KB1(Pr) w - - 0 1",
+                "8/8/8/K1pP3r/8/8/8/7k w - c6 0 1",
+                # In check: single slider, knight, pawn (with en passant) and double
+                "4r2k/8/8/1B6/8/2N5/(PR)7/4K3 w - - 0 1",
+                "7k/8/8/8/2Q5/3n4/4(NP)3/R3K2R w KQ - 0 1",
+                "8/8/8/3pP3/2K5/8/8/7k w - d6 0 1",
+                "4r2k/8/8/8/8/3n4/8/R3K3 w Q - 0 1",
+                # Stacked checker: pawn and queen on d7 both check, one square
+                "1nb(qr)k1nr/1pp(PQ)pp1p/p6b/6p1/8/8/PP1PPPPP/R1BNKBNR b KQk - 0 7",
+                # King steps: retreat along the checking ray, capture a stack
+                "7k/8/8/8/8/8/r3K3/8 w - - 0 1",
+                "7k/8/8/8/8/3(pn)4/4K3/3r4 w - - 0 1",
+                # Castling: klik onto f1 into an attacked g1, c1 attacked
+                "4k3/8/8/2b5/8/8/8/R3KN1R w KQ - 0 1",
+                "4k3/8/8/8/8/8/8/R3K2(RN) w KQ - 0 1",
+                "4k3/8/8/8/6b1/8/8/(RP)3K2R w KQ - 0 1"):
+        b3 = Board()
+        b3.set_fen(fen)
+        brute = [m for m in generate_moves(b3, legal_only=False) if is_legal(b3, m)]
+        assert_eq(sorted(m.to_uci() for m in generate_moves(b3)),
+                  sorted(m.to_uci() for m in brute), f"Legal moves match in {fen}")
+
 
 def test_self_play_no_crash():
     """Play a short self-play game to test no crashes with new rules."""
@@ -965,6 +1200,13 @@ def run_all_tests():
 
     # Make/unmake consistency
     test_make_unmake_all_move_types()
+    test_zobrist_incremental()
+    test_fen_cache()
+    test_eval_cache()
+    test_move_cache()
+    test_transposition_table()
+    test_null_move()
+    test_api_keep_alive()
 
     # Edge cases
     test_klik_then_unklik()
@@ -3,7 +3,7 @@ Klikschaak Engine - Type Definitions
 """
 from enum import IntEnum, auto
 from typing import NamedTuple, Optional, List, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 # Colors
 class Color(IntEnum):
@@ -11,7 +11,10 @@ class Color(IntEnum):
     BLACK = 1
 
     def opposite(self) -> 'Color':
-        return Color.BLACK if self == Color.WHITE else Color.WHITE
+        return OPPOSITE_COLOR[self]
+
+# Color by index of the other side: a tuple index, no enum construction
+OPPOSITE_COLOR = (Color.BLACK, Color.WHITE)
 
 # Piece types (without color)
 class PieceType(IntEnum):
@@ -39,18 +42,17 @@ class Piece(IntEnum):
     B_QUEEN = 13
     B_KING = 14
 
-def piece_color(p: Piece) -> Optional[Color]:
-    if p == Piece.NONE:
-        return None
-    return Color.WHITE if p < 8 else Color.BLACK
+# The helpers below return plain ints, which compare equal to the enum
+# members; constructing an enum member goes through its value lookup
+
+def piece_color(p: Piece) -> int:
+    return p >> 3 if p else -1  # -1: no piece
 
 def piece_type(p: Piece) -> PieceType:
-    if p == Piece.NONE:
-        return PieceType.NONE
-    return PieceType(p & 7)
+    return p & 7
 
 def make_piece(color: Color, pt: PieceType) -> Piece:
-    return Piece(pt + (8 if color == Color.BLACK else 0))
+    return pt | (color << 3)
 
 # Move types
 class MoveType(IntEnum):
@@ -92,59 +94,65 @@ def make_square(file: int, rank: int) -> int:
     """Create square from file and rank"""
     return rank * 8 + file
 
+# Square names by index; Square.NONE (64) is "-"
+SQUARE_NAMES = tuple(chr(ord('a') + (sq & 7)) + str((sq >> 3) + 1)
+                     for sq in range(64)) + ("-",)
+NAME_TO_SQUARE = {name: sq for sq, name in enumerate(SQUARE_NAMES[:64])}
+
 def square_name(sq: int) -> str:
     """Convert square to algebraic notation"""
-    if sq == Square.NONE:
-        return "-"
-    return chr(ord('a') + square_file(sq)) + str(square_rank(sq) + 1)
+    return SQUARE_NAMES[sq]
 
 def parse_square(name: str) -> int:
     """Parse algebraic notation to square"""
-    if len(name) != 2:
-        return Square.NONE
-    file = ord(name[0]) - ord('a')
-    rank = int(name[1]) - 1
-    if 0 <= file < 8 and 0 <= rank < 8:
-        return make_square(file, rank)
-    return Square.NONE
-
-# Move representation
-@dataclass
+    return NAME_TO_SQUARE.get(name, Square.NONE)
+
+def _uci_suffix(code: int) -> str:
+    """UCI suffix for the upper bits of Move.packed (type, unklik index, promotion)"""
+    mt, unklik_index, promotion = code & 15, ((code >> 4) & 3) - 1, code >> 6
+    s = ("", "", "n", "b", "r", "q", "", "")[promotion]
+    if mt == MoveType.KLIK:
+        s += "k"
+    elif mt == MoveType.UNKLIK:
+        s += f"u{unklik_index}"
+    elif mt == MoveType.UNKLIK_KLIK:
+        s += f"U{unklik_index}"
+    return s
+
+# UCI text as two lookups on Move.packed: the from/to squares (low 12 bits)
+# and the suffix (the rest)
+FROM_TO_NAMES = tuple(SQUARE_NAMES[i & 63] + SQUARE_NAMES[i >> 6] for i in range(4096))
+UCI_SUFFIX = tuple(_uci_suffix(code) for code in range(512))
+
+# Move representation (slots: the move pools hold tens of thousands)
+@dataclass(slots=True)
 class Move:
     from_sq: int
     to_sq: int
     move_type: MoveType
     unklik_index: int = 0      # Which piece from stack (0=bottom, 1=top)
     promotion: PieceType = PieceType.NONE
+    # All fields in one int, so equality and hashing are a single compare.
+    # Moves are never modified after construction.
+    packed: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # from:6 | to:6 | type:4 | unklik index + 1 (-1..1):2 | promotion:3
+        self.packed = (self.from_sq | (self.to_sq << 6) | (self.move_type << 12) |
+                       ((self.unklik_index + 1) << 16) | (self.promotion << 18))
 
     def __eq__(self, other):
         if not isinstance(other, Move):
             return False
-        return (self.from_sq == other.from_sq and
-                self.to_sq == other.to_sq and
-                self.move_type == other.move_type and
-                self.unklik_index == other.unklik_index and
-                self.promotion == other.promotion)
+        return self.packed == other.packed
 
     def __hash__(self):
-        return hash((self.from_sq, self.to_sq, self.move_type,
-                     self.unklik_index, self.promotion))
+        return self.packed  # A small non-negative int is its own hash
 
     def to_uci(self) -> str:
         """Convert to UCI-style notation with Klikschaak extensions"""
-        s = square_name(self.from_sq) + square_name(self.to_sq)
-
-        if self.promotion != PieceType.NONE:
-            s += "nbrq"[self.promotion - PieceType.KNIGHT]
-
-        if self.move_type == MoveType.KLIK:
-            s += "k"
-        elif self.move_type == MoveType.UNKLIK:
-            s += f"u{self.unklik_index}"
-        elif self.move_type == MoveType.UNKLIK_KLIK:
-            s += f"U{self.unklik_index}"
-
-        return s
+        packed = self.packed
+        return FROM_TO_NAMES[packed & 0xFFF] + UCI_SUFFIX[packed >> 12]
 
     def __repr__(self):
         return f"Move({self.to_uci()})"
@@ -152,7 +160,14 @@ class Move:
 # Stack on a square (max 2 pieces)
 @dataclass
 class SquareStack:
-    pieces: List[Piece]  # Bottom first, max 2
+    # One slot, no per-instance __dict__: the board holds 64 of these and
+    # Board.copy() creates 64 more each time
+    __slots__ = ('pieces',)
+    # Bottom first, max 2. Holds plain int piece codes (Piece values): int
+    # indexing and bit ops stay on CPython's fast paths, and ints compare
+    # equal to the Piece members. A list is never changed in place (here
+    # and in make_move, edits assign a new one), so copies may share it
+    pieces: List[int]
 
     def __init__(self, pieces: List[Piece] = None):
         self.pieces = pieces if pieces else []
@@ -174,28 +189,32 @@ class SquareStack:
 
     def add(self, piece: Piece):
         if len(self.pieces) < 2:
-            self.pieces.append(piece)
+            self.pieces = self.pieces + [int(piece)]
 
     def remove_top(self) -> Piece:
-        if self.pieces:
-            return self.pieces.pop()
+        pieces = self.pieces
+        if pieces:
+            self.pieces = pieces[:-1]
+            return pieces[-1]
         return Piece.NONE
 
     def remove_at(self, index: int) -> Piece:
-        if 0 <= index < len(self.pieces):
-            return self.pieces.pop(index)
+        pieces = self.pieces
+        if 0 <= index < len(pieces):
+            self.pieces = pieces[:index] + pieces[index + 1:]
+            return pieces[index]
         return Piece.NONE
 
     def clear(self):
         self.pieces = []
 
     def copy(self) -> 'SquareStack':
-        return SquareStack(self.pieces.copy())
+        return SquareStack(self.pieces)
 
     def __repr__(self):
         if not self.pieces:
             return "[]"
-        return f"[{', '.join(PIECE_CHARS[p] for p in self.pieces)}]"
+        return f"[{', '.join(PIECE_CHARS_LIST[p] for p in self.pieces)}]"
 
 # Castling rights
 class CastlingRights(IntEnum):
@@ -219,13 +238,18 @@ PIECE_CHARS = {
 
 CHAR_TO_PIECE = {v: k for k, v in PIECE_CHARS.items()}
 
-# Piece values for evaluation
-PIECE_VALUES = {
-    PieceType.NONE: 0,
-    PieceType.PAWN: 100,
-    PieceType.KNIGHT: 320,
-    PieceType.BISHOP: 330,
-    PieceType.ROOK: 500,
-    PieceType.QUEEN: 900,
-    PieceType.KING: 20000,
-}
+# List forms of the above for hot paths (FEN, display): index by piece value
+# or by character byte (giving the plain int piece code stored in stacks);
+# None marks bytes that are not a piece
+PIECE_CHARS_LIST = [PIECE_CHARS.get(p, '?') for p in range(16)]
+CHAR_TO_PIECE_ARR = [None] * 256
+for _ch, _p in CHAR_TO_PIECE.items():
+    if _p != Piece.NONE:
+        CHAR_TO_PIECE_ARR[ord(_ch)] = int(_p)
+del _ch, _p
+
+# Piece values for evaluation, indexed by piece type (NONE, P, N, B, R, Q, K)
+PIECE_VALUES = (0, 100, 320, 330, 500, 900, 20000)
+
+# The same by raw piece code (colour bit included; unused codes are 0)
+PIECE_VALUES_BY_PIECE = tuple(PIECE_VALUES[p & 7] if (p & 7) < 7 else 0 for p in range(16))
@@ -0,0 +1,34 @@
+"""
+Klikschaak Engine - Zobrist Keys
+"""
+import random
+
+
+class ZobristKeys:
+    """Pre-computed random keys for Zobrist hashing."""
+
+    def __init__(self, seed: int = 42):
+        rng = random.Random(seed)
+
+        # piece_keys[piece_value][stack_index][square]
+        # piece values: 0-14, stack_index: 0-1, square: 0-63
+        self.piece_keys = [[[rng.getrandbits(64) for _ in range(64)]
+                            for _ in range(2)]
+                           for _ in range(15)]
+
+        self.turn_key = rng.getrandbits(64)
+
+        # Castling keys for each of the 16 possible states
+        self.castling_keys = [rng.getrandbits(64) for _ in range(16)]
+
+        # En passant file keys
+        self.ep_keys = [rng.getrandbits(64) for _ in range(8)]  # 8 files
+
+
+ZOBRIST = ZobristKeys()
+
+# Flat aliases for the hot paths (board mutators, make_move)
+ZOBRIST_PIECE = ZOBRIST.piece_keys
+ZOBRIST_TURN = ZOBRIST.turn_key
+ZOBRIST_CASTLING = ZOBRIST.castling_keys
+ZOBRIST_EP = ZOBRIST.ep_keys